@@ -0,0 +1,57 @@
+"""
+Compare two benchmark reports written by benchmarks.run.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 1.2
+
+Prints the median ratio of every stage and document present in both reports
+and exits with status 1 if any of them got slower than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, Tuple
+
+
+def load(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {(result["stage"], result["document"]): result for result in report["results"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="slowdown ratio treated as a regression"
+    )
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    current = load(args.current)
+
+    regressions = 0
+    for key in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[key], current[key]
+        stage, document = key
+        if "median" not in before or "median" not in after:
+            status = after.get("error") or before.get("error")
+            print(f"{stage:<30} {document:<20} skipped: {status}")
+            continue
+
+        ratio = after["median"] / before["median"] if before["median"] else float("inf")
+        regressed = ratio > args.threshold
+        regressions += regressed
+        print(
+            f"{stage:<30} {document:<20} {before['median'] * 1000:9.1f} ms -> "
+            f"{after['median'] * 1000:9.1f} ms  x{ratio:.2f}{'  REGRESSION' if regressed else ''}"
+        )
+
+    if regressions:
+        print(f"{regressions} regression(s) above x{args.threshold}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Synthetic Russian invoice corpus.
+
+Everything is generated offline from a seed: born-digital PDFs with a text
+layer (reportlab), scanned-style PDFs rasterized with noise, blur and skew,
+and phone-photo JPEGs with perspective and uneven lighting.
+"""
+
+import io
+import os
+import random
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional, Tuple
+
+import cv2
+import numpy as np
+from loguru import logger
+from PIL import Image, ImageDraw, ImageFont
+
+DocumentKind = Literal["digital", "scan", "photo"]
+
+# A4 at the DPI scans usually come in
+RASTER_DPI = 200
+PAGE_SIZE_PT = (595, 842)
+
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+SUPPLIERS = ["ООО «Ромашка»", "АО «Северный ветер»", "ИП Иванов И.И.", "ООО «ТехноСнаб»"]
+BUYERS = ["ООО «Лютик»", "АО «Восток»", "ООО «СтройМаркет»", "ИП Петрова А.С."]
+BANKS = ["ПАО Сбербанк г. Москва", "АО «Альфа-Банк»", "Банк ВТБ (ПАО)"]
+PRODUCTS = [
+    "Бумага офисная А4",
+    "Картридж лазерный",
+    "Монитор 24 дюйма",
+    "Клавиатура беспроводная",
+    "Услуги доставки",
+    "Кабель сетевой 5 м",
+    "Стул офисный",
+    "Настройка оборудования",
+    "Папка-регистратор",
+    "Ручка шариковая синяя",
+]
+HEADERS = ["№", "Наименование товара", "Кол-во", "Ед.", "Цена", "Сумма"]
+# relative column widths of HEADERS
+COLUMN_WIDTHS = [0.06, 0.44, 0.1, 0.08, 0.15, 0.17]
+
+TRANSLITERATION = str.maketrans(
+    {
+        **dict(zip("абвгдезийклмнопрстуфхцыэ", "abvgdezijklmnoprstufhcye", strict=True)),
+        **dict(zip("АБВГДЕЗИЙКЛМНОПРСТУФХЦЫЭ", "ABVGDEZIJKLMNOPRSTUFHCYE", strict=True)),
+        "ё": "e", "Ё": "E", "ж": "zh", "Ж": "Zh", "ч": "ch", "Ч": "Ch", "ш": "sh",
+        "Ш": "Sh", "щ": "sch", "Щ": "Sch", "ъ": "", "Ъ": "", "ь": "", "Ь": "",
+        "ю": "yu", "Ю": "Yu", "я": "ya", "Я": "Ya", "№": "N", "«": '"', "»": '"',
+    }
+)  # fmt: skip
+
+
+@dataclass
+class Invoice:
+    number: int
+    date: str
+    supplier: str
+    supplier_inn: str
+    buyer: str
+    bank: str
+    bik: str
+    account: str
+    contract: str
+    rows: List[List[str]]
+    total: str
+
+
+@dataclass
+class Document:
+    name: str
+    kind: DocumentKind
+    pages: int
+    rows: int
+    file_bytes: bytes
+    # rasterized pages with the pixel rect of their table, empty for born-digital PDFs
+    page_images: List[Tuple[np.ndarray, Tuple[int, int, int, int]]] = field(default_factory=list)
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.kind != "photo"
+
+
+class Fonts:
+    """A Cyrillic TTF font; without one the text is transliterated to Latin"""
+
+    def __init__(self, path: Optional[str] = None):
+        path = path or os.environ.get("BENCHMARK_FONT")
+        if path is None:
+            path = next((p for p in FONT_CANDIDATES if os.path.exists(p)), None)
+        self.cyrillic = path is not None
+        if path is None:
+            import reportlab
+
+            path = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+            logger.warning("No Cyrillic font found, invoices are transliterated (use --font)")
+        self.path = path
+        self._pil = {}
+
+    def text(self, text: str) -> str:
+        return text if self.cyrillic else text.translate(TRANSLITERATION)
+
+    def pil(self, size: int) -> ImageFont.FreeTypeFont:
+        if size not in self._pil:
+            self._pil[size] = ImageFont.truetype(self.path, size)
+        return self._pil[size]
+
+
+def make_invoice(rows: int, rng: random.Random) -> Invoice:
+    table = []
+    total = 0.0
+    for i in range(1, rows + 1):
+        quantity = rng.randint(1, 50)
+        price = rng.randint(50, 50_000) + rng.choice([0, 0.5, 0.99])
+        amount = quantity * price
+        total += amount
+        table.append(
+            [str(i), rng.choice(PRODUCTS), str(quantity), "шт", money(price), money(amount)]
+        )
+
+    return Invoice(
+        number=rng.randint(1, 9999),
+        date=f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(2020, 2025)}",
+        supplier=rng.choice(SUPPLIERS),
+        supplier_inn="".join(rng.choice("0123456789") for _ in range(10)),
+        buyer=rng.choice(BUYERS),
+        bank=rng.choice(BANKS),
+        bik="04" + "".join(rng.choice("0123456789") for _ in range(7)),
+        account="40702810" + "".join(rng.choice("0123456789") for _ in range(12)),
+        contract=f"{rng.randint(1, 300)}-{rng.randint(20, 25)}",
+        rows=table,
+        total=money(total),
+    )
+
+
+def money(value: float) -> str:
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",")
+
+
+def header_lines(invoice: Invoice) -> List[str]:
+    return [
+        f"Счет № {invoice.number} от {invoice.date}",
+        f"Поставщик: {invoice.supplier}",
+        f"ИНН {invoice.supplier_inn}",
+        f"Покупатель: {invoice.buyer}",
+        f"Договор № {invoice.contract}",
+        f"Банк: {invoice.bank}",
+        f"БИК {invoice.bik}",
+        f"Расчетный счет {invoice.account}",
+    ]
+
+
+def split_rows(invoice: Invoice, pages: int) -> List[List[List[str]]]:
+    per_page = -(-len(invoice.rows) // pages)
+    return [invoice.rows[i : i + per_page] for i in range(0, len(invoice.rows), per_page)] or [[]]
+
+
+def digital_pdf(invoice: Invoice, pages: int, fonts: Fonts) -> bytes:
+    """Born-digital PDF with a text layer and a ruled table"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    if "BenchmarkFont" not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont("BenchmarkFont", fonts.path))
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=PAGE_SIZE_PT)
+    width, height = PAGE_SIZE_PT
+    margin = 40
+    table_width = width - 2 * margin
+    col_x = np.cumsum([0] + [w * table_width for w in COLUMN_WIDTHS]) + margin
+    row_height = 18
+
+    chunks = split_rows(invoice, pages)
+    for page_num, page_rows in enumerate(chunks, 1):
+        y = height - margin
+        pdf.setFont("BenchmarkFont", 10)
+        if page_num == 1:
+            for line in header_lines(invoice):
+                pdf.drawString(margin, y, fonts.text(line))
+                y -= 16
+            y -= 10
+
+        table = [HEADERS] + page_rows
+        top = y
+        for row in table:
+            for x, cell in zip(col_x[:-1], row, strict=True):
+                pdf.drawString(x + 3, y - row_height + 5, fonts.text(cell))
+            y -= row_height
+        for i in range(len(table) + 1):
+            pdf.line(col_x[0], top - i * row_height, col_x[-1], top - i * row_height)
+        for x in col_x:
+            pdf.line(x, top, x, y)
+
+        if page_num == len(chunks):
+            pdf.drawString(margin, y - 20, fonts.text(f"Итого: {invoice.total} руб"))
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_page(
+    invoice: Invoice, page_rows: List[List[str]], first: bool, last: bool, fonts: Fonts
+) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+    """Clean grayscale raster of one invoice page and the rect of its table"""
+    scale = RASTER_DPI / 72
+    width, height = int(PAGE_SIZE_PT[0] * scale), int(PAGE_SIZE_PT[1] * scale)
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = fonts.pil(int(10 * scale))
+
+    margin = int(40 * scale)
+    y = margin
+    if first:
+        for line in header_lines(invoice):
+            draw.text((margin, y), fonts.text(line), font=font, fill=0)
+            y += int(16 * scale)
+        y += int(10 * scale)
+
+    table_width = width - 2 * margin
+    col_x = [int(x) for x in np.cumsum([0] + [w * table_width for w in COLUMN_WIDTHS]) + margin]
+    row_height = int(18 * scale)
+    table = [HEADERS] + page_rows
+    top = y
+    for row in table:
+        for x, cell in zip(col_x[:-1], row, strict=True):
+            draw.text((x + 8, y + 10), fonts.text(cell), font=font, fill=0)
+        y += row_height
+    line_width = max(2, int(scale))
+    for i in range(len(table) + 1):
+        row_y = top + i * row_height
+        draw.line([(col_x[0], row_y), (col_x[-1], row_y)], fill=0, width=line_width)
+    for x in col_x:
+        draw.line([(x, top), (x, y)], fill=0, width=line_width)
+
+    if last:
+        draw.text(
+            (margin, y + row_height), fonts.text(f"Итого: {invoice.total} руб"), font=font, fill=0
+        )
+
+    table_rect = (col_x[0], top, col_x[-1] - col_x[0], y - top)
+    return np.array(page), table_rect
+
+
+def scan_artifacts(page: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Skew, blur, paper tone and sensor noise of a flatbed scan"""
+    height, width = page.shape
+    angle = rng.uniform(-1.5, 1.5)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    page = cv2.warpAffine(page, matrix, (width, height), borderValue=255)
+    page = cv2.GaussianBlur(page, (3, 3), 0)
+    noise = rng.normal(0, 12, page.shape)
+    page = np.clip(page.astype(np.float32) * 0.92 + 10 + noise, 0, 255).astype(np.uint8)
+    return page
+
+
+def photo_artifacts(page: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Perspective, uneven lighting and JPEG-like noise of a phone photo"""
+    height, width = page.shape
+    jitter = 0.06
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    offsets = rng.uniform(-jitter, jitter, (4, 2)) * [width, height]
+    matrix = cv2.getPerspectiveTransform(corners, np.float32(corners + offsets))
+    page = cv2.warpPerspective(page, matrix, (width, height), borderValue=90)
+
+    # light falls off from a random point
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+    distance = np.sqrt((xx - cx) ** 2 + (yy - cy) ** 2) / max(width, height)
+    lighting = 1.0 - 0.45 * distance
+    noise = rng.normal(0, 8, page.shape)
+    page = np.clip(page.astype(np.float32) * lighting + noise, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(page, cv2.COLOR_GRAY2BGR)
+
+
+def raster_pdf(images: List[np.ndarray]) -> bytes:
+    buffer = io.BytesIO()
+    pil_pages = [Image.fromarray(image).convert("RGB") for image in images]
+    pil_pages[0].save(
+        buffer, format="PDF", save_all=True, append_images=pil_pages[1:], resolution=RASTER_DPI
+    )
+    return buffer.getvalue()
+
+
+def make_document(kind: DocumentKind, pages: int, rows: int, seed: int, fonts: Fonts) -> Document:
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    invoice = make_invoice(rows, rng)
+    name = f"{kind}_{pages}p_{rows}r"
+
+    if kind == "digital":
+        return Document(name, kind, pages, rows, digital_pdf(invoice, pages, fonts))
+
+    chunks = split_rows(invoice, pages) if kind == "scan" else [invoice.rows]
+    page_images = []
+    for i, page_rows in enumerate(chunks):
+        image, table_rect = render_page(invoice, page_rows, i == 0, i == len(chunks) - 1, fonts)
+        if kind == "scan":
+            image = scan_artifacts(image, np_rng)
+        else:
+            image = photo_artifacts(image, np_rng)
+        page_images.append((image, table_rect))
+
+    if kind == "scan":
+        file_bytes = raster_pdf([image for image, _ in page_images])
+    else:
+        ok, encoded = cv2.imencode(".jpg", page_images[0][0], [cv2.IMWRITE_JPEG_QUALITY, 80])
+        file_bytes = encoded.tobytes()
+    return Document(name, kind, len(chunks), rows, file_bytes, page_images)
+
+
+def build_corpus(quick: bool = False, seed: int = 0, font: Optional[str] = None) -> List[Document]:
+    """
+    Invoices of every kind with varying table sizes and page counts
+
+    `quick` keeps one small document per kind for a smoke run.
+    """
+    fonts = Fonts(font)
+    if quick:
+        layouts = [("digital", 1, 5), ("scan", 1, 5), ("photo", 1, 5)]
+    else:
+        layouts = [
+            ("digital", 1, 5),
+            ("digital", 1, 30),
+            ("digital", 5, 120),
+            ("scan", 1, 5),
+            ("scan", 1, 30),
+            ("scan", 3, 60),
+            ("photo", 1, 5),
+            ("photo", 1, 20),
+        ]
+    return [
+        make_document(kind, pages, rows, seed + i, fonts)
+        for i, (kind, pages, rows) in enumerate(layouts)
+    ]
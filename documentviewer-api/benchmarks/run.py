@@ -0,0 +1,241 @@
+"""
+Per-stage benchmarks of the document pipeline.
+
+Run from the documentviewer-api directory:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+Every stage is timed separately on a synthetic invoice corpus and the
+results are written as JSON. Stages that need poppler or Tesseract are
+reported with an error instead of failing the whole run when the binaries
+are missing.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+
+from .corpus import Document, build_corpus
+
+STAGES = [
+    "pdf_bytes_to_images",
+    "preprocess_image",
+    "find_cells_in_table",
+    "find_table_grid",
+    "detect_table_cells_advanced",
+    "ocr_scanner_process_pdf",
+    "route",
+]
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    """Wall-clock seconds of `repeat` calls after `warmup` untimed ones"""
+    try:
+        for _ in range(warmup):
+            fn()
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start_time)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+
+def non_empty(result: Any) -> Any:
+    if not result:
+        raise RuntimeError("stage returned no result")
+    return result
+
+
+def table_region(document: Document):
+    """Grayscale crop around the first table"""
+    image, (x, y, w, h) = document.page_images[0]
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # the rect is known before skew and perspective were applied, leave room for both
+    expand = max(w, h) // 25
+    return gray[max(0, y - expand) : y + h + expand, max(0, x - expand) : x + w + expand]
+
+
+def page_bgr(document: Document):
+    image = document.page_images[0][0]
+    return image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+def pdf_bytes_to_images(pdf_bytes: bytes) -> list:
+    """Whole-document rasterization, the API renders one page per pool task instead"""
+    import pdf2image
+
+    from services.pdf_render_service import DEFAULT_DPI, poppler_path
+
+    return pdf2image.convert_from_bytes(pdf_bytes, dpi=DEFAULT_DPI, poppler_path=poppler_path)
+
+
+def stage_benchmarks(document: Document) -> Dict[str, Callable[[], Any]]:
+    """Stage name -> call for every stage that applies to the document"""
+    from services.ocr_image_service import (
+        detect_table_cells_advanced,
+        find_cells_in_table,
+        find_table_grid,
+        preprocess_image,
+    )
+    from services.ocr_scanner_service.service import ocr_scanner_service
+
+    calls = {}
+    if document.is_pdf:
+        calls["pdf_bytes_to_images"] = lambda: non_empty(pdf_bytes_to_images(document.file_bytes))
+        calls["ocr_scanner_process_pdf"] = lambda: ocr_scanner_service.process_pdf(
+            document.file_bytes
+        )
+
+    if document.page_images:
+        image = document.page_images[0][0]
+        region = table_region(document)
+        bgr = page_bgr(document)
+        calls["preprocess_image"] = lambda: preprocess_image(image)
+        calls["find_cells_in_table"] = lambda: find_cells_in_table(region)
+        calls["find_table_grid"] = lambda: find_table_grid(region)
+        calls["detect_table_cells_advanced"] = lambda: detect_table_cells_advanced(bgr)
+
+    return calls
+
+
+def route_benchmark(client, document: Document) -> Callable[[], Any]:
+    if document.is_pdf:
+        url, filename, content_type = "/upload", f"{document.name}.pdf", "application/pdf"
+    else:
+        url, filename, content_type = "/upload-image", f"{document.name}.jpg", "image/jpeg"
+
+    def post():
+        response = client.post(
+            url,
+            files={"file": (filename, document.file_bytes, content_type)},
+            data={"user_id": 0, "filename": filename},
+        )
+        response.raise_for_status()
+
+    return post
+
+
+def run(corpus: List[Document], stages: List[str], repeat: int) -> List[Dict[str, Any]]:
+    results = []
+
+    def record(stage: str, document: Document, fn: Callable[[], Any]) -> None:
+        stats = measure(fn, repeat)
+        results.append(
+            {
+                "stage": stage,
+                "document": document.name,
+                "kind": document.kind,
+                "pages": document.pages,
+                "rows": document.rows,
+                "file_size": len(document.file_bytes),
+                **stats,
+            }
+        )
+        summary = stats.get("error") or f"median {stats['median'] * 1000:.1f} ms"
+        print(f"{stage:<30} {document.name:<20} {summary}", file=sys.stderr)
+
+    for document in corpus:
+        for stage, fn in stage_benchmarks(document).items():
+            if stage in stages:
+                record(stage, document, fn)
+
+    if "route" in stages:
+        from fastapi.testclient import TestClient
+
+        from main import app
+
+        # the lifespan starts the process pool and the job workers
+        with TestClient(app) as client:
+            for document in corpus:
+                record("route", document, route_benchmark(client, document))
+
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(args: argparse.Namespace, corpus: List[Document]) -> Dict[str, Any]:
+    from core.config import config
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "config": {
+            name: getattr(config, name)
+            for name in (
+                "OCR_ENGINE",
+                "OCR_POOL_WORKERS",
+                "TABLE_OCR_MODE",
+                "TABLE_GRID_ENGINE",
+                "OCR_SCALE_MODE",
+                "RESULT_CACHE_ENABLED",
+            )
+        },
+        "corpus": {
+            "quick": args.quick,
+            "seed": args.seed,
+            "documents": [document.name for document in corpus],
+        },
+        "repeat": args.repeat,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", "-o", help="JSON file, stdout by default")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per stage")
+    parser.add_argument("--quick", action="store_true", help="one small document per kind")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", help="TTF font with Cyrillic glyphs")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to run")
+    args = parser.parse_args()
+
+    corpus = build_corpus(quick=args.quick, seed=args.seed, font=args.font)
+    report = {
+        "environment": environment(args, corpus),
+        "results": run(corpus, args.stages, args.repeat),
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    # identical uploads would be answered from the result cache
+    os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+    main()
@@ -1,5 +1,7 @@
-from typing import Literal
+import os
+from typing import Literal, Optional
 
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,5 +17,72 @@ class Config(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    # CPU-bound OCR / PDF work is executed in a process pool
+    OCR_POOL_WORKERS: int = Field(default_factory=lambda: os.cpu_count() or 1, ge=1)
+    # Tasks allowed to wait for a free worker before requests are rejected
+    OCR_POOL_QUEUE_SIZE: int = Field(default=32, ge=0)
+    OCR_POOL_RETRY_AFTER: int = 5
+
+    # "auto" prefers a persistent in-process tesserocr API and falls back to pytesseract
+    OCR_ENGINE: Literal["auto", "tesserocr", "pytesseract"] = "auto"
+    OCR_LANG: str = "rus"
+    TESSDATA_PATH: Optional[str] = None
+    # "batched" recognizes a table once and maps words to cells, "per_cell" runs OCR per cell
+    TABLE_OCR_MODE: Literal["batched", "per_cell"] = "batched"
+    # "projection" builds a row x column grid from ruling-line projections and falls back
+    # to "contours", the contour search over the line mask, for tables without a grid
+    TABLE_GRID_ENGINE: Literal["projection", "contours"] = "projection"
+    # "adaptive" scales images by measured glyph height within OCR_MAX_PIXELS,
+    # "fixed" keeps the original uncapped 4x/2x upscale, which admission budgets
+    # at ~0.5 GiB per concurrently OCRed A4 page
+    OCR_SCALE_MODE: Literal["adaptive", "fixed"] = "adaptive"
+    OCR_TARGET_TEXT_HEIGHT: int = 30
+    OCR_MIN_SCALE: float = 0.5
+    OCR_MAX_SCALE: float = 4.0
+    # upper bound on the pixel count of an image handed to Tesseract in adaptive mode
+    OCR_MAX_PIXELS: int = 40_000_000
+
+    # A PDF page with at least this many text-layer chars covering this share of the
+    # page area is treated as born-digital and is not OCRed
+    TEXT_LAYER_MIN_CHARS: int = 32
+    TEXT_LAYER_MIN_COVERAGE: float = 0.002
+
+    # Results of identical uploads are served from memory, then from disk
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = Field(default=256, ge=1)
+    # empty value disables the disk tier
+    RESULT_CACHE_DIR: str = "cache/results"
+    RESULT_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+    # seconds, 0 means entries never expire
+    RESULT_CACHE_TTL: int = 7 * 24 * 60 * 60
+
+    # Uploads are processed as jobs; defaults to one job per pool worker
+    JOB_WORKERS: Optional[int] = Field(default=None, ge=1)
+    JOB_QUEUE_SIZE: int = Field(default=100, ge=0)
+    # seconds a finished job and its result stay available for polling
+    JOB_RESULT_TTL: int = 60 * 60
+
+    # /upload-batch: files in one request and files of a batch processed concurrently,
+    # the latter defaults to one per job worker
+    BATCH_MAX_FILES: int = Field(default=500, ge=1)
+    BATCH_PARALLELISM: Optional[int] = Field(default=None, ge=1)
+
+    # Pages of one document processed concurrently; defaults to the pool size
+    PAGE_PARALLELISM: Optional[int] = Field(default=None, ge=1)
+
+    # Uploads are admitted against an estimate of the memory needed to process them;
+    # documents that can never fit are rejected, the others wait for free budget
+    MEMORY_BUDGET_BYTES: int = 4 * 1024 * 1024 * 1024
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    MAX_PAGES: int = Field(default=200, ge=1)
+
+    # Uploads are streamed to temporary files here, empty value means the system temp dir
+    UPLOAD_SPOOL_DIR: Optional[str] = None
+    UPLOAD_CHUNK_SIZE: int = Field(default=1024 * 1024, ge=1)
+
+    LOG_LEVEL: Literal["TRACE", "DEBUG", "INFO", "WARNING", "ERROR"] = "DEBUG"
+    # share of DEBUG lines that are written; defaults to all of them in DEV and 10% in PROD
+    LOG_DEBUG_SAMPLE_RATE: Optional[float] = Field(default=None, ge=0, le=1)
+
 
 config = Config()
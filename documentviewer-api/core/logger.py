@@ -1,8 +1,56 @@
+import json
+import random
+import sys
+import traceback
+
 from loguru import logger
 
+from core.config import config
+
+DEBUG_LEVEL = 10
+
+if config.LOG_DEBUG_SAMPLE_RATE is not None:
+    debug_sample_rate = config.LOG_DEBUG_SAMPLE_RATE
+else:
+    debug_sample_rate = 1.0 if config.MODE == "DEV" else 0.1
+
+
+def sample_debug(record) -> bool:
+    """Every record above DEBUG passes, DEBUG and TRACE ones are sampled"""
+    if record["level"].no > DEBUG_LEVEL:
+        return True
+    return random.random() < debug_sample_rate
+
+
+def json_format(record) -> str:
+    """One JSON object per line; the fields passed to the log call are kept as keys"""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "source": f"{record['name']}:{record['function']}:{record['line']}",
+        **record["extra"],
+    }
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["json"] = json.dumps(entry, ensure_ascii=False, default=str)
+    return "{extra[json]}\n"
+
+
+logger.remove()
+# enqueue=True hands records to a background thread, log calls never wait for the disk
+logger.add(
+    sys.stderr,
+    level=config.LOG_LEVEL,
+    filter=sample_debug,
+    enqueue=True,
+)
 logger.add(
     "logs/logfile.{time:YYYY-MM-DD}.log",
-    format="{time:YYYY-MM-DD at HH:mm:ss} | {level:<8} | {message}",
+    level=config.LOG_LEVEL,
+    format=json_format,
+    filter=sample_debug,
+    enqueue=True,
     rotation="1 week",
     encoding="utf-8",
 )
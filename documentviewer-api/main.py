@@ -1,31 +1,84 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from loguru import logger
 
 from core.config import config
 from core.logger import *  # noqa
 from middlewares.logging import LoggingMiddleware
+from middlewares.metrics import MetricsMiddleware
 from routers.files.router import router as files_router
+from routers.jobs.router import router as jobs_router
+from services.admission_service.service import DocumentTooLargeError, admission_service
+from services.job_service.service import job_service
+from services.metrics_service import render_metrics
+from services.process_pool_service import PoolSaturatedError, process_pool_service
+from services.result_cache_service import result_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    process_pool_service.start()
+    job_service.start()
+    yield
+    await job_service.stop()
+    process_pool_service.shutdown()
+
 
 app = FastAPI(
     title="Document Viewer API",
     description="API for document viewer",
     version=config.VERSION,
     docs_url="/docs",
+    lifespan=lifespan,
 )
 
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(files_router)
+app.include_router(jobs_router)
+
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    return JSONResponse(
+        status_code=503,
+        content={"status": "error", "message": "Server is busy, please retry later"},
+        headers={"Retry-After": str(config.OCR_POOL_RETRY_AFTER)},
+    )
+
+
+@app.exception_handler(DocumentTooLargeError)
+async def document_too_large_handler(request: Request, exc: DocumentTooLargeError):
+    return JSONResponse(
+        status_code=413,
+        content={"status": "error", "message": str(exc)},
+    )
 
 
 @app.get("/health")
 def health():
-    return {
-        "status": "OK",
+    healthy = process_pool_service.healthy
+    content = {
+        "status": "OK" if healthy else "ERROR",
         "mode": config.MODE,
         "version": config.VERSION,
         "docs_url": "/docs" if config.MODE == "DEV" else None,
+        "pool": process_pool_service.stats(),
+        "cache": result_cache.stats(),
+        "jobs": job_service.stats(),
+        "admission": admission_service.stats(),
     }
+    # a broken pool fails every job, let the orchestrator see it
+    return JSONResponse(status_code=200 if healthy else 503, content=content)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
 
 
 if __name__ == "__main__":
@@ -2,63 +2,75 @@ import time
 from typing import Any
 
 from loguru import logger
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import Headers, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from core.config import config
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+class LoggingMiddleware:
+    """Plain ASGI middleware, the request and its body stream are passed through untouched"""
 
-        request_data = await self._extract_request_data(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
 
         logger.info(
             "Incoming request: {method} {path}",
-            method=request.method,
-            path=request.url.path,
-            **request_data,
+            method=method,
+            path=path,
+            **self._extract_request_data(scope),
         )
 
-        try:
-            response = await call_next(request)
-
-            process_time = time.time() - start_time
-
-            logger.info(
-                "Response: {status_code} for {method} {path} in {process_time:.3f}s",
-                status_code=response.status_code,
-                method=request.method,
-                path=request.url.path,
-                process_time=process_time,
-            )
+        status_code = 500
 
-            return response
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
+        try:
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            process_time = time.time() - start_time
-            logger.error(
+            logger.opt(exception=True).error(
                 "Request failed: {method} {path} - {error}",
-                method=request.method,
-                path=request.url.path,
+                method=method,
+                path=path,
                 error=str(e),
-                process_time=process_time,
-                exc_info=True,
+                process_time=time.perf_counter() - start_time,
             )
             raise
 
-    async def _extract_request_data(self, request: Request) -> dict[str, Any]:
+        logger.info(
+            "Response: {status_code} for {method} {path} in {process_time:.3f}s",
+            status_code=status_code,
+            method=method,
+            path=path,
+            process_time=time.perf_counter() - start_time,
+        )
+
+    @staticmethod
+    def _extract_request_data(scope: Scope) -> dict[str, Any]:
+        headers = Headers(scope=scope)
         data = {
-            "user_agent": request.headers.get("referer"),
-            "content_type": request.headers.get("content-type"),
-            "content_length": request.headers.get("content-length"),
+            "user_agent": headers.get("user-agent"),
+            "content_type": headers.get("content-type"),
+            "content_length": headers.get("content-length"),
         }
         if config.MODE == "DEV":
             data.update(
                 {
-                    "query_params": dict(request.query_params),
-                    "path_params": dict(request.path_params),
+                    "query_params": dict(QueryParams(scope.get("query_string", b""))),
+                    "path_params": dict(scope.get("path_params", {})),
                 }
             )
 
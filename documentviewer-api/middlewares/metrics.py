@@ -0,0 +1,40 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metrics_service import REQUEST_SECONDS, REQUESTS, REQUESTS_IN_FLIGHT
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = self._route(scope)
+            REQUESTS.labels(scope["method"], route, status_code).inc()
+            REQUEST_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start_time)
+
+    @staticmethod
+    def _route(scope: Scope) -> str:
+        # the router stores the matched route in the shared scope;
+        # the path template keeps job ids out of the labels
+        route = scope.get("route")
+        return getattr(route, "path", "unmatched")
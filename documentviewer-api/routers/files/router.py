@@ -1,18 +1,23 @@
-from typing import Annotated
+import asyncio
+import json
+import os
+from typing import Annotated, AsyncIterator, List, Literal, Optional, Set, Tuple
 
-from fastapi import APIRouter, Form, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+
+from core.config import config
+from services.admission_service.service import DocumentTooLargeError
+from services.job_service.service import Job, job_service
+from services.process_pool_service import PoolSaturatedError
+from services.upload_spool_service import SpooledUpload, upload_spool
 
-from services.ocr_scanner_service.service import ocr_scanner_service
-from services.ocr_image_service import (
-    handle_pdf_upload,
-    process_image_all_text,
-    process_pic,
-    process_image_all_text_for_image,
-)
 from .schemas import UploadFileResponse
 
 router = APIRouter()
 
+image_extensions = {".jpg", ".jpeg", ".png"}
+
 
 @router.post("/upload")
 async def upload_file(
@@ -20,34 +25,11 @@ async def upload_file(
     user_id: int = Form(...),
     filename: str = Form(...),
 ) -> UploadFileResponse:
-    file_bytes = await file.read()
-    # with tables
-    result = ocr_scanner_service.process_pdf(pdf_bytes=file_bytes)
-    if result.status == "error":
-        print("_________")
-        # only if text-like tpd
-        result = handle_pdf_upload(file_bytes)
-        return UploadFileResponse(
-            status="success",
-            filename=filename,
-            user_id=user_id,
-            file_size=len(file_bytes),
-            message="success",
-            data=result,
-        )
-    # all text
-    result2 = process_image_all_text(file_bytes)
-    # print(result2)
-    result.data["whole text"] = result2
-    print(result)
-    return UploadFileResponse(
-        status=result.status,
-        filename=filename,
-        user_id=user_id,
-        file_size=len(file_bytes),
-        message=result.message or "File successfully processed",
-        data=result.data,
-    )
+    upload = await upload_spool.spool(file)
+    job = await job_service.run("pdf", upload, user_id, filename)
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=job.error)
+    return to_upload_response(job)
 
 
 @router.post("/upload-image")
@@ -56,16 +38,169 @@ async def upload_image(
     user_id: int = Form(...),
     filename: str = Form(...),
 ) -> UploadFileResponse:
-    # TODO: Implement image upload logic
-    file_bytes = await file.read()
-    result = process_pic(file_bytes)
-    result2 = process_image_all_text_for_image(file_bytes)
-    result["data"]["whole_text"] = result2
+    upload = await upload_spool.spool(file)
+    job = await job_service.run("image", upload, user_id, filename)
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=job.error)
+    return to_upload_response(job)
+
+
+@router.post("/upload-stream")
+async def upload_stream(
+    file: Annotated[UploadFile, Form(...)],
+    user_id: int = Form(...),
+    filename: str = Form(...),
+) -> StreamingResponse:
+    """
+    /upload with the result of every page streamed as NDJSON.
+
+    A {"event": "page", "page": "page_N", "data": ...} line is written as soon
+    as a page is finished, pages of large documents finish out of order. The
+    last line is {"event": "result", ...} with the UploadFileResponse fields
+    of the whole document. Cached documents only get the result line.
+    """
+    upload = await upload_spool.spool(file)
+    job = await job_service.submit("pdf", upload, user_id, filename, retain=False)
+    # nothing has run yet, the subscription sees every page
+    events = job.subscribe()
+    return StreamingResponse(stream_job(job, events), media_type="application/x-ndjson")
+
+
+async def stream_job(job: Job, events: asyncio.Queue) -> AsyncIterator[str]:
+    try:
+        while (event := await events.get()) is not None:
+            yield json.dumps({"event": "page", **event}, ensure_ascii=False) + "\n"
+    finally:
+        # the job keeps running for the cache when the client goes away
+        job.unsubscribe(events)
+    result = to_upload_response(job).model_dump(mode="json")
+    yield json.dumps({"event": "result", **result}, ensure_ascii=False) + "\n"
+
+
+@router.post("/upload-batch")
+async def upload_batch(
+    files: Annotated[List[UploadFile], File(...)],
+    user_id: int = Form(...),
+) -> StreamingResponse:
+    """
+    Process many files at once.
+
+    Every file is answered with one NDJSON line in the UploadFileResponse
+    format as soon as it is finished, so the lines do not follow the request
+    order. At most BATCH_PARALLELISM files are processed concurrently.
+    """
+    if len(files) > config.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch has {len(files)} files, the limit is {config.BATCH_MAX_FILES}",
+        )
+
+    # spool everything before responding, the form files are not ours once streaming starts
+    items: List[Tuple[str, str, Optional[SpooledUpload], Optional[str]]] = []
+    try:
+        for file in files:
+            filename = file.filename or "file"
+            kind = detect_kind(file, filename)
+            try:
+                items.append((filename, kind, await upload_spool.spool(file), None))
+            except DocumentTooLargeError as e:
+                items.append((filename, kind, None, str(e)))
+    except BaseException:
+        for _, _, upload, _ in items:
+            if upload is not None:
+                upload.discard()
+        raise
+
+    return StreamingResponse(stream_batch(items, user_id), media_type="application/x-ndjson")
+
+
+async def stream_batch(
+    items: List[Tuple[str, str, Optional[SpooledUpload], Optional[str]]], user_id: int
+) -> AsyncIterator[str]:
+    semaphore = asyncio.Semaphore(
+        config.BATCH_PARALLELISM or config.JOB_WORKERS or config.OCR_POOL_WORKERS
+    )
+
+    # uploads handed to a job belong to it, the others are removed here
+    submitted: Set[int] = set()
+
+    async def process(filename: str, kind: str, upload: SpooledUpload) -> UploadFileResponse:
+        try:
+            async with semaphore:
+                job = await job_service.submit(kind, upload, user_id, filename, retain=False)
+                submitted.add(id(upload))
+                await job.wait()
+        except DocumentTooLargeError as e:
+            return error_response(filename, user_id, upload.size, str(e))
+        except PoolSaturatedError:
+            return error_response(filename, user_id, upload.size, "Server is busy")
+        return to_upload_response(job)
+
+    uploads = [(filename, kind, upload) for filename, kind, upload, _ in items if upload]
+    tasks = [asyncio.create_task(process(*item)) for item in uploads]
+    try:
+        for filename, _, upload, error in items:
+            if upload is None:
+                yield error_response(filename, user_id, 0, error).model_dump_json() + "\n"
+        for task in asyncio.as_completed(tasks):
+            response = await task
+            yield response.model_dump_json() + "\n"
+    finally:
+        # the client may have gone away, stop files that are still waiting
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for _, _, upload in uploads:
+            if id(upload) not in submitted:
+                upload.discard()
+
+
+def detect_kind(file: UploadFile, filename: str) -> Literal["pdf", "image"]:
+    if file.content_type and file.content_type.startswith("image/"):
+        return "image"
+    if os.path.splitext(filename.lower())[1] in image_extensions:
+        return "image"
+    return "pdf"
+
+
+def error_response(filename: str, user_id: int, file_size: int, message: str) -> UploadFileResponse:
     return UploadFileResponse(
-        status="success",
+        status="error",
         filename=filename,
         user_id=user_id,
-        file_size=len(file_bytes),
-        message="Image successfully processed",
-        data=result,
+        file_size=file_size,
+        message=message,
+        data={},
+    )
+
+
+def to_upload_response(job: Job) -> UploadFileResponse:
+    if job.status == "error":
+        return UploadFileResponse(
+            status="error",
+            filename=job.filename,
+            user_id=job.user_id,
+            file_size=job.file_size,
+            message=f"Processing failed: {job.error}",
+            data={},
+            metadata=job_metadata(job),
+        )
+    return UploadFileResponse(
+        status=job.result.status,
+        filename=job.filename,
+        user_id=job.user_id,
+        file_size=job.file_size,
+        message=job.result.message,
+        data=job.result.data,
+        metadata=job_metadata(job),
     )
+
+
+def job_metadata(job: Job) -> dict:
+    return {
+        "pages": job.pages_total,
+        "cached": job.cached,
+        "timings": job.timings,
+        "estimated_memory_bytes": job.cost.memory_bytes if job.cost else None,
+        "peak_rss_bytes": job.usage.peak_rss_bytes,
+    }
@@ -10,3 +10,5 @@ class UploadFileResponse(BaseModel):
     file_size: int
     message: str
     data: dict
+    # pages, timings and memory usage of the processing
+    metadata: dict = {}
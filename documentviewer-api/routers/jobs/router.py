@@ -0,0 +1,74 @@
+from typing import Annotated, Literal, Optional
+
+from fastapi import APIRouter, Form, HTTPException, UploadFile, status
+
+from routers.files.router import detect_kind, to_upload_response
+from routers.files.schemas import UploadFileResponse
+from services.job_service.service import Job, job_service
+from services.upload_spool_service import upload_spool
+
+from .schemas import JobMemory, JobProgress, JobResponse
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    file: Annotated[UploadFile, Form(...)],
+    user_id: int = Form(...),
+    filename: str = Form(...),
+    kind: Optional[Literal["pdf", "image"]] = Form(None),
+) -> JobResponse:
+    upload = await upload_spool.spool(file)
+    job = await job_service.submit(kind or detect_kind(file, filename), upload, user_id, filename)
+    return to_job_response(job)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str) -> JobResponse:
+    return to_job_response(get_job_or_404(job_id))
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str) -> UploadFileResponse:
+    job = get_job_or_404(job_id)
+    if not job.finished:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job.status}",
+        )
+    return to_upload_response(job)
+
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+def job_memory(job: Job) -> JobMemory:
+    return JobMemory(
+        estimated_bytes=job.cost.memory_bytes if job.cost else None,
+        peak_rss_bytes=job.usage.peak_rss_bytes,
+    )
+
+
+def to_job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        filename=job.filename,
+        user_id=job.user_id,
+        file_size=job.file_size,
+        cached=job.cached,
+        progress=JobProgress(
+            pages_total=job.pages_total,
+            pages_done=job.pages_done,
+            pages=job.pages,
+        ),
+        timings=job.timings,
+        memory=job_memory(job),
+        error=job.error,
+    )
@@ -0,0 +1,29 @@
+from typing import Dict, Literal, Optional
+
+from pydantic import BaseModel
+
+
+class JobProgress(BaseModel):
+    pages_total: Optional[int] = None
+    pages_done: int = 0
+    pages: Dict[str, str] = {}
+
+
+class JobMemory(BaseModel):
+    # admission estimate and the highest worker RSS reached by the job's tasks
+    estimated_bytes: Optional[int] = None
+    peak_rss_bytes: Optional[int] = None
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: Literal["pdf", "image"]
+    status: Literal["queued", "running", "done", "error"]
+    filename: str
+    user_id: int
+    file_size: int
+    cached: bool
+    progress: JobProgress
+    timings: Dict[str, float]
+    memory: JobMemory
+    error: Optional[str] = None
@@ -0,0 +1,12 @@
+from typing import List, Tuple
+
+from pydantic import BaseModel
+
+
+class DocumentCost(BaseModel):
+    pages: int
+    # page sizes in pixels at the rendering DPI
+    page_sizes: List[Tuple[int, int]]
+    file_size: int
+    # estimated peak memory of processing the document
+    memory_bytes: int
@@ -0,0 +1,128 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Tuple
+
+import pdfplumber
+from loguru import logger
+from PIL import Image
+
+from core.config import config
+from services.pdf_render_service import DEFAULT_DPI
+
+from .schemas import DocumentCost
+
+
+class DocumentTooLargeError(Exception):
+    """Raised when a document can never fit into the configured limits"""
+
+
+class AdmissionService:
+    """
+    Memory-budget admission control.
+
+    The cost of a document is estimated up front from its page count and page
+    sizes (PDF) or its header dimensions (images). Documents that can never
+    fit are rejected, the others wait until enough of the budget is free.
+    """
+
+    def __init__(self, budget_bytes: int, max_upload_bytes: int, max_pages: int):
+        self.budget_bytes = budget_bytes
+        self.max_upload_bytes = max_upload_bytes
+        self.max_pages = max_pages
+        self._in_use = 0
+        self._waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def estimate(self, kind: str, file_path: str, file_size: int) -> DocumentCost:
+        if file_size > self.max_upload_bytes:
+            raise DocumentTooLargeError(
+                f"File is {file_size} bytes, the limit is {self.max_upload_bytes}"
+            )
+
+        # pdfplumber only walks the page tree here, but keep it off the event loop
+        page_sizes = await asyncio.to_thread(self._page_sizes, kind, file_path)
+        cost = DocumentCost(
+            pages=len(page_sizes),
+            page_sizes=page_sizes,
+            file_size=file_size,
+            memory_bytes=self._memory_cost(page_sizes, file_size),
+        )
+
+        if cost.pages > self.max_pages:
+            raise DocumentTooLargeError(
+                f"Document has {cost.pages} pages, the limit is {self.max_pages}"
+            )
+        if cost.memory_bytes > self.budget_bytes:
+            raise DocumentTooLargeError(
+                f"Document needs about {cost.memory_bytes // 2**20} MiB to process, "
+                f"the budget is {self.budget_bytes // 2**20} MiB"
+            )
+        return cost
+
+    @asynccontextmanager
+    async def reserve(self, cost: DocumentCost) -> AsyncIterator[None]:
+        """Hold `cost.memory_bytes` of the budget, waiting until it is available"""
+        async with self._condition:
+            self._waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: self._in_use + cost.memory_bytes <= self.budget_bytes
+                )
+            finally:
+                self._waiting -= 1
+            self._in_use += cost.memory_bytes
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_use -= cost.memory_bytes
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "in_use_bytes": self._in_use,
+            "waiting": self._waiting,
+        }
+
+    def _page_sizes(self, kind: str, file_path: str) -> List[Tuple[int, int]]:
+        try:
+            if kind == "image":
+                # only the header is read, pixels are not decoded
+                with Image.open(file_path) as image:
+                    return [image.size]
+
+            scale = DEFAULT_DPI / 72
+            with pdfplumber.open(file_path) as pdf:
+                return [(int(page.width * scale), int(page.height * scale)) for page in pdf.pages]
+        except Exception as e:
+            # unreadable documents fail fast in the pipeline, admit them as tiny
+            logger.debug(f"Could not estimate document cost: {e}")
+            return []
+
+    def _memory_cost(self, page_sizes: List[Tuple[int, int]], file_size: int) -> int:
+        if not page_sizes:
+            return file_size * 2
+
+        # every pool task renders exactly the one page it works on
+        parallel_pages = min(len(page_sizes), config.PAGE_PARALLELISM or config.OCR_POOL_WORKERS)
+        largest = max(width * height for width, height in page_sizes)
+        # rendered RGB page and its grayscale copy
+        rendered = largest * 4
+        # rescaled image for Tesseract: grayscale, threshold and cleaned copies plus
+        # roughly the same again inside Tesseract
+        if config.OCR_SCALE_MODE == "fixed":
+            # whole-text OCR upscales 4x without a pixel budget
+            scaled = largest * 16
+        else:
+            scaled = min(largest * config.OCR_MAX_SCALE**2, config.OCR_MAX_PIXELS)
+        ocr = int(scaled * 4)
+        # workers read the spooled upload from disk, only pdfplumber parses it into memory
+        return (rendered + ocr) * parallel_pages + file_size
+
+
+admission_service = AdmissionService(
+    budget_bytes=config.MEMORY_BUDGET_BYTES,
+    max_upload_bytes=config.MAX_UPLOAD_BYTES,
+    max_pages=config.MAX_PAGES,
+)
@@ -0,0 +1,4 @@
+from typing import Literal
+
+JobKind = Literal["pdf", "image"]
+JobStatus = Literal["queued", "running", "done", "error"]
@@ -0,0 +1,286 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from core.config import config
+from services.admission_service.schemas import DocumentCost
+from services.admission_service.service import admission_service
+from services.metrics_service import record_document
+from services.pipeline_service.schemas import PipelineResult
+from services.pipeline_service.service import (
+    PipelineTracker,
+    run_image_pipeline,
+    run_pdf_pipeline,
+)
+from services.process_pool_service import PoolSaturatedError, ResourceUsage, resource_usage
+from services.result_cache_service import result_cache
+from services.upload_spool_service import SpooledUpload
+
+from .schemas import JobKind, JobStatus
+
+
+class Job(PipelineTracker):
+    """A single upload going through the pipeline, tracks its own progress"""
+
+    def __init__(
+        self,
+        kind: JobKind,
+        upload: SpooledUpload,
+        user_id: int,
+        filename: str,
+        cost: Optional[DocumentCost] = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.filename = filename
+        self.file_size = upload.size
+        self.upload: Optional[SpooledUpload] = upload
+        self.status: JobStatus = "queued"
+        self.cached = False
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.pages_total: Optional[int] = None
+        self.pages: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+        self.result: Optional[PipelineResult] = None
+        self.error: Optional[str] = None
+        # success, fallback (pdfplumber found nothing, tables were OCRed), cached or error
+        self.outcome = "success"
+        self.cost = cost
+        self.usage = ResourceUsage()
+        self._done = asyncio.Event()
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    async def wait(self) -> "Job":
+        await self._done.wait()
+        return self
+
+    def set_pages(self, total: int) -> None:
+        self.pages_total = total
+        for page_num in range(1, total + 1):
+            self.pages.setdefault(f"page_{page_num}", "pending")
+
+    def page_done(self, page_num: int, status: str = "done") -> None:
+        self.pages[f"page_{page_num}"] = status
+
+    def page_result(self, page_num: int, result: Dict[str, Any]) -> None:
+        for queue in self._subscribers:
+            queue.put_nowait({"page": f"page_{page_num}", "data": result})
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue of page results from now on, None marks the end of the job.
+
+        Results of pages finished before the call are not replayed.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        if self._done.is_set():
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def add_timing(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def set_outcome(self, outcome: str) -> None:
+        self.outcome = outcome
+
+    @property
+    def pages_done(self) -> int:
+        return sum(1 for status in self.pages.values() if status != "pending")
+
+
+class JobService:
+    """
+    In-process job queue.
+
+    Uploads are queued and picked up by `workers` asyncio tasks which drive the
+    pipeline stages in the process pool. Finished jobs are kept for `retention`
+    seconds so clients can poll for the result.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retention: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention = retention
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)
+        ]
+        logger.info(f"Job service started: {self.workers} workers, queue size {self.queue_size}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job service stopped")
+
+    async def submit(
+        self,
+        kind: JobKind,
+        upload: SpooledUpload,
+        user_id: int,
+        filename: str,
+        retain: bool = True,
+    ) -> Job:
+        """
+        Queue a spooled upload, the job owns the file from now on.
+
+        Uploads with a cached result are not queued, the returned job is
+        already finished. Only retained jobs can be looked up by id and are
+        kept for `retention` seconds after they finish; callers that wait for
+        the result themselves pass retain=False.
+        """
+        if not self._tasks:
+            self.start()
+        self._prune()
+
+        try:
+            key = result_cache.make_key(kind, upload.sha256)
+            cached = await result_cache.get(key)
+            if cached is not None:
+                job = Job(kind, upload, user_id, filename)
+                if retain:
+                    self._jobs[job.id] = job
+                logger.debug(f"Result cache hit for job {job.id}")
+                self._mark_running(job)
+                self._set_cached(job, cached)
+                job.status = "done"
+                self._finish(job)
+                return job
+
+            if self._queue.qsize() >= self.queue_size:
+                logger.warning(f"Job queue is full: {self._queue.qsize()} jobs waiting")
+                raise PoolSaturatedError(self.workers + self.queue_size)
+
+            # raises DocumentTooLargeError for documents that can never be admitted
+            cost = await admission_service.estimate(kind, upload.path, upload.size)
+        except BaseException:
+            upload.discard()
+            raise
+        job = Job(kind, upload, user_id, filename, cost)
+        if retain:
+            self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        logger.debug(f"Job {job.id} queued: {kind} {filename} from user {user_id}")
+        return job
+
+    async def run(self, kind: JobKind, upload: SpooledUpload, user_id: int, filename: str) -> Job:
+        """Submit a job and wait until it is finished, the job is not retained"""
+        job = await self.submit(kind, upload, user_id, filename, retain=False)
+        return await job.wait()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": len(self._jobs),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job) -> None:
+        # pool tasks started from this job report their peak memory to it
+        token = resource_usage.set(job.usage)
+        try:
+            key = result_cache.make_key(job.kind, job.upload.sha256)
+            # an identical upload may have finished while this one was queued
+            cached = await result_cache.get(key)
+            if cached is not None:
+                logger.debug(f"Result cache hit for job {job.id}")
+                self._mark_running(job)
+                self._set_cached(job, cached)
+            else:
+                # the job stays queued until its memory estimate fits into the budget
+                async with admission_service.reserve(job.cost):
+                    self._mark_running(job)
+                    if job.kind == "pdf":
+                        # admission has counted the pages already
+                        job.result = await run_pdf_pipeline(job.upload.path, job, job.cost.pages)
+                    else:
+                        job.result = await run_image_pipeline(job.upload.path, job)
+                if job.result.status == "success":
+                    await result_cache.set(key, job.result.model_dump())
+            job.status = "done"
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed: {e}")
+            job.status = "error"
+            job.error = str(e)
+            job.outcome = "error"
+        finally:
+            resource_usage.reset(token)
+            self._finish(job)
+
+    @staticmethod
+    def _set_cached(job: Job, cached: dict) -> None:
+        job.cached = True
+        job.outcome = "cached"
+        job.result = PipelineResult(**cached)
+
+    @staticmethod
+    def _finish(job: Job) -> None:
+        job.finished_at = time.time()
+        job.add_timing("total", job.finished_at - job.created_at)
+        record_document(job.kind, job.outcome, job.pages_total, job.file_size)
+        # the upload is not needed anymore, do not keep it with the result
+        job.upload.discard()
+        job.upload = None
+        job._done.set()
+        for queue in job._subscribers:
+            queue.put_nowait(None)
+        job._subscribers.clear()
+
+    @staticmethod
+    def _mark_running(job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.add_timing("queued", job.started_at - job.created_at)
+
+    def _prune(self) -> None:
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_service = JobService(
+    workers=config.JOB_WORKERS or config.OCR_POOL_WORKERS,
+    queue_size=config.JOB_QUEUE_SIZE,
+    retention=config.JOB_RESULT_TTL,
+)
@@ -0,0 +1,138 @@
+"""
+Prometheus metrics of the API and the processing pipeline.
+
+Pipeline stages run in process pool workers, where the metrics of the API
+process are out of reach. Inside a pool task observations are collected in a
+list, shipped back with the task result and recorded by the API process
+(see process_pool_service). Outside of the pool they are recorded directly.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# from a small table crop to a slow multi-page OCR run
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+REQUEST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CELL_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+STAGE_SECONDS = Histogram(
+    "documentviewer_stage_seconds",
+    "Time spent in a processing stage; stages may be nested (cell_ocr includes preprocess)",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+TABLE_CELLS = Histogram(
+    "documentviewer_table_cells",
+    "Cells recognized per table",
+    buckets=CELL_BUCKETS,
+)
+
+DOCUMENTS = Counter(
+    "documentviewer_documents_total",
+    "Finished documents by kind and outcome (success, fallback, cached, error)",
+    ["kind", "outcome"],
+)
+PAGES = Counter(
+    "documentviewer_pages_total",
+    "Pages of processed documents, cache hits excluded",
+    ["kind"],
+)
+BYTES = Counter(
+    "documentviewer_bytes_total",
+    "Upload bytes of processed documents, cache hits excluded",
+    ["kind"],
+)
+
+POOL_RESTARTS = Counter(
+    "documentviewer_pool_restarts_total",
+    "Process pool restarts after a worker died",
+)
+
+REQUESTS = Counter(
+    "documentviewer_http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "documentviewer_http_request_seconds",
+    "HTTP request duration by route",
+    ["method", "route"],
+    buckets=REQUEST_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "documentviewer_http_requests_in_flight",
+    "HTTP requests being handled",
+)
+
+
+class Observation(NamedTuple):
+    metric: str
+    label: Optional[str]
+    value: float
+
+
+# set while a pool task runs, observations wait here for the API process
+_pending: Optional[List[Observation]] = None
+
+
+def _record(observation: Observation) -> None:
+    if observation.metric == "stage":
+        STAGE_SECONDS.labels(observation.label).observe(observation.value)
+    elif observation.metric == "table_cells":
+        TABLE_CELLS.observe(observation.value)
+
+
+def _observe(observation: Observation) -> None:
+    if _pending is not None:
+        _pending.append(observation)
+    else:
+        _record(observation)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    _observe(Observation("stage", stage, seconds))
+
+
+def observe_table_cells(count: int) -> None:
+    _observe(Observation("table_cells", None, count))
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start_time)
+
+
+@contextmanager
+def collect_observations() -> Iterator[List[Observation]]:
+    """Executed in the worker: gathers the observations of one pool task"""
+    global _pending
+    _pending = []
+    try:
+        yield _pending
+    finally:
+        _pending = None
+
+
+def record_observations(observations: List[Observation]) -> None:
+    """Executed in the API process with the observations a pool task sent back"""
+    for observation in observations:
+        _record(observation)
+
+
+def record_document(kind: str, outcome: str, pages: Optional[int], file_size: int) -> None:
+    DOCUMENTS.labels(kind, outcome).inc()
+    if outcome != "cached":
+        PAGES.labels(kind).inc(pages or 0)
+        BYTES.labels(kind).inc(file_size)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition of every metric and its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,176 @@
+import os
+import subprocess
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+import pytesseract
+from loguru import logger
+from PIL import Image
+
+from core.config import config
+
+try:
+    import tesserocr
+except ImportError:  # optional dependency, pytesseract is used instead
+    tesserocr = None
+
+if os.name == "nt":
+    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+else:
+    # Check possible installation paths
+    possible_paths = ["/usr/bin/tesseract", "/usr/local/bin/tesseract", "/bin/tesseract"]
+    for path in possible_paths:
+        if os.path.exists(path):
+            pytesseract.pytesseract.tesseract_cmd = path
+            logger.info(f"Tesseract found: {path}")
+            break
+    # If not found, use which command
+    result = subprocess.run(["which", "tesseract"], capture_output=True, text=True)
+    if result.returncode == 0:
+        pytesseract.pytesseract.tesseract_cmd = result.stdout.strip()
+        logger.info(f"Tesseract found via which: {pytesseract.pytesseract.tesseract_cmd}")
+    else:
+        logger.critical(
+            "WARNING: Tesseract not found in the system. Install it using your package manager."
+        )
+        raise Exception("Tesseract not found in the system. Install it using your package manager.")
+
+
+class OCRWord(NamedTuple):
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+class OCREngine:
+    """Common interface of the Tesseract backends"""
+
+    name = "base"
+
+    def image_to_string(self, image) -> str:
+        raise NotImplementedError
+
+    def image_to_words(self, image) -> List[OCRWord]:
+        """Recognize the image once and return words with boxes in reading order"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class PytesseractEngine(OCREngine):
+    """Runs the tesseract binary once per call"""
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str):
+        self.lang = lang
+
+    def image_to_string(self, image) -> str:
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+    def image_to_words(self, image) -> List[OCRWord]:
+        data = pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+        words = []
+        for i, text in enumerate(data["text"]):
+            text = text.strip()
+            # level 5 rows are words, the rest are page/block/line containers
+            if data["level"][i] != 5 or not text:
+                continue
+            words.append(
+                OCRWord(
+                    text=text,
+                    left=int(data["left"][i]),
+                    top=int(data["top"][i]),
+                    width=int(data["width"][i]),
+                    height=int(data["height"][i]),
+                )
+            )
+        return words
+
+
+class TesserocrEngine(OCREngine):
+    """Keeps one initialized Tesseract API (with loaded traineddata) for the whole process"""
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str, tessdata_path: Optional[str] = None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        kwargs = {"lang": lang}
+        if tessdata_path:
+            kwargs["path"] = tessdata_path
+        self._api = tesserocr.PyTessBaseAPI(**kwargs)
+
+    def image_to_string(self, image) -> str:
+        self._api.SetImage(_to_pil(image))
+        return self._api.GetUTF8Text()
+
+    def image_to_words(self, image) -> List[OCRWord]:
+        self._api.SetImage(_to_pil(image))
+        self._api.Recognize()
+        words = []
+        level = tesserocr.RIL.WORD
+        for word in tesserocr.iterate_level(self._api.GetIterator(), level):
+            text = (word.GetUTF8Text(level) or "").strip()
+            box = word.BoundingBox(level)
+            if not text or box is None:
+                continue
+            x1, y1, x2, y2 = box
+            words.append(OCRWord(text=text, left=x1, top=y1, width=x2 - x1, height=y2 - y1))
+        return words
+
+    def close(self) -> None:
+        self._api.End()
+
+
+def _to_pil(image) -> Image.Image:
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, np.ndarray) and image.ndim == 3:
+        # OpenCV arrays are BGR
+        image = image[:, :, ::-1]
+    return Image.fromarray(image)
+
+
+def create_ocr_engine(
+    backend: Optional[str] = None,
+    lang: Optional[str] = None,
+) -> OCREngine:
+    backend = backend or config.OCR_ENGINE
+    lang = lang or config.OCR_LANG
+
+    if backend in ("auto", "tesserocr"):
+        try:
+            engine = TesserocrEngine(lang, config.TESSDATA_PATH)
+            logger.info(f"OCR engine: tesserocr ({lang})")
+            return engine
+        except Exception as e:
+            if backend == "tesserocr":
+                raise
+            logger.warning(f"tesserocr unavailable ({e}), falling back to pytesseract")
+
+    logger.info(f"OCR engine: pytesseract ({lang})")
+    return PytesseractEngine(lang)
+
+
+_engine: Optional[OCREngine] = None
+
+
+def get_ocr_engine() -> OCREngine:
+    """Return the engine of the current process, creating it on first use"""
+    global _engine
+    if _engine is None:
+        _engine = create_ocr_engine()
+    return _engine
+
+
+def warm_up_ocr_engine() -> None:
+    """Process pool initializer: load traineddata before the first task arrives"""
+    try:
+        get_ocr_engine()
+    except Exception as e:
+        # the error will resurface on the first task, do not break the pool
+        logger.error(f"Failed to initialize OCR engine: {e}")
@@ -1,107 +1,113 @@
+import io
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
 import cv2
 import numpy as np
-import pytesseract
-from PIL import Image
-import io
-import pdf2image
-from typing import Dict, Any
-import os
 from loguru import logger
+from PIL import Image
+
+from core.config import config
+from services.metrics_service import observe_table_cells, stage_timer
+from services.ocr_engine_service import get_ocr_engine
 
-if os.name == "nt":
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-    poppler_path = r"D:\poopler\poppler-25.11.0\Library\bin"
-else:
-    # Check possible installation paths
-    possible_paths = ["/usr/bin/tesseract", "/usr/local/bin/tesseract", "/bin/tesseract"]
-    for path in possible_paths:
-        if os.path.exists(path):
-            pytesseract.pytesseract.tesseract_cmd = path
-            logger.info(f"Tesseract found: {path}")
-            break
-    # If not found, use which command
-    import subprocess
-
-    result = subprocess.run(["which", "tesseract"], capture_output=True, text=True)
-    if result.returncode == 0:
-        pytesseract.pytesseract.tesseract_cmd = result.stdout.strip()
-        logger.info(f"Tesseract found via which: {pytesseract.pytesseract.tesseract_cmd}")
-    else:
-        logger.critical(
-            "WARNING: Tesseract not found in the system. Install it using your package manager."
-        )
-        raise Exception("Tesseract not found in the system. Install it using your package manager.")
 
+class GridCell(NamedTuple):
+    """A table cell in grid coordinates, rect is (x, y, w, h) in page pixels"""
 
-def process_image_all_text(pdf_bytes: bytes) -> str:
-    images = pdf_bytes_to_images(pdf_bytes)
-    if not images:
-        return {"error": "Failed to extract images from PDF"}
+    row: int
+    col: int
+    row_span: int
+    col_span: int
+    rect: Tuple[int, int, int, int]
 
-    results = ""
 
-    for page_num, image in enumerate(images, 1):
+def process_page_all_text(image) -> str:
+    """Recognize all text on a single rendered page"""
+    with stage_timer("preprocess"):
         image = np.array(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        height, width, channels = image.shape
-        image = cv2.resize(image, (width * 4, height * 4))
-        # convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        denoised = cv2.medianBlur(gray, 3)
+        # convert to grayscale before resizing, the colour copy would be 3x larger
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        del image
+        gray = resize_for_ocr(gray, default_scale=4)
         thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]
+        del gray
 
         # delete little noices using morphological operations
         kernel = np.ones((1, 1), np.uint8)
         cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)  # delete small white dots
         cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel)  # fill little black dots
+        del thresh
 
-        result = cleaned
-        text = pytesseract.image_to_string(
-            result,
-            lang="rus",
-        )
-        results += text
+    with stage_timer("page_ocr"):
+        text = get_ocr_engine().image_to_string(cleaned)
     return text
 
 
-def process_image_all_text_for_image(pic_bytes):
-    image = bytes_to_image(pic_bytes)
-    image = np.array(image)
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    height, width, channels = image.shape
-    image = cv2.resize(image, (width * 4, height * 4))
-    # convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    denoised = cv2.medianBlur(gray, 3)
-    thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]
-
-    # delete little noices using morphological operations
-    kernel = np.ones((1, 1), np.uint8)
-    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)  # delete small white dots
-    cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel)  # fill little black dots
-
-    result = cleaned
-    text = pytesseract.image_to_string(
-        result,
-        lang="rus",
+def estimate_text_height(gray) -> Optional[float]:
+    """
+    Median glyph height in pixels, measured on connected components of a
+    downsampled copy. Returns None when no glyph-like components are found.
+    """
+    height, width = gray.shape[:2]
+    # measure on at most ~1000 px on the long side, glyph statistics survive it
+    factor = min(1.0, 1000 / max(height, width))
+    small = gray
+    if factor < 1.0:
+        small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+    binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count < 2:
+        return None
+
+    # skip the background label
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    # glyphs: not specks, not table rules, not whole blocks
+    glyphs = (
+        (heights >= 2)
+        & (heights < small.shape[0] * 0.9)
+        & (widths <= heights * 4)
+        & (heights <= widths * 8)
     )
-    return text
+    if np.count_nonzero(glyphs) < 3:
+        return None
 
+    return float(np.median(heights[glyphs])) / factor
 
-def pdf_bytes_to_images(pdf_bytes: bytes) -> list:
+
+def choose_ocr_scale(gray, default_scale: float) -> float:
     """
-    Convert PDF from bytes to image list
+    Scale that brings glyphs to the preferred Tesseract size within the pixel
+    budget; "fixed" mode keeps `default_scale` as the pipeline always did
     """
-    try:
-        # Use pdf2image to convert PDF to images
-        if os.name == "nt":
-            images = pdf2image.convert_from_bytes(pdf_bytes, dpi=300, poppler_path=poppler_path)
-        else:
-            images = pdf2image.convert_from_bytes(pdf_bytes, dpi=300)
-        return images
-    except Exception as e:
-        logger.error(f"Error converting PDF: {e}")
-        return []
+    if config.OCR_SCALE_MODE == "fixed":
+        return float(default_scale)
+
+    height, width = gray.shape[:2]
+    scale = float(default_scale)
+    text_height = estimate_text_height(gray)
+    if text_height:
+        scale = config.OCR_TARGET_TEXT_HEIGHT / text_height
+        scale = min(max(scale, config.OCR_MIN_SCALE), config.OCR_MAX_SCALE)
+
+    budget_scale = (config.OCR_MAX_PIXELS / max(1, height * width)) ** 0.5
+    return min(scale, budget_scale)
+
+
+def resize_for_ocr(gray, default_scale: float):
+    scale = choose_ocr_scale(gray, default_scale)
+    if abs(scale - 1.0) < 0.05:
+        return gray
+    height, width = gray.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(gray, size, interpolation=interpolation)
+
+
+def process_image_all_text_for_image(pic_bytes):
+    image = pic_bytes if isinstance(pic_bytes, Image.Image) else bytes_to_image(pic_bytes)
+    return process_page_all_text(image.convert("RGB"))
 
 
 def bytes_to_image(pic_bytes):
@@ -111,31 +117,29 @@ def bytes_to_image(pic_bytes):
 
 def preprocess_image(image):
     """Image preprocessing for improving text recognition"""
-    if isinstance(image, Image.Image):
-        # Convert PIL Image to numpy array
-        image = np.array(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-    if len(image.shape) == 3:
-        height, width, channels = image.shape
-    else:
-        height, width = image.shape
-        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    with stage_timer("preprocess"):
+        if isinstance(image, Image.Image):
+            # Convert PIL Image to numpy array
+            image = np.array(image)
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+        # Convert to grayscale
+        if len(image.shape) == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
 
-    # Upscale image
-    image = cv2.resize(image, (width * 2, height * 2))
+        # Rescale so that glyphs have a size Tesseract likes
+        gray = resize_for_ocr(gray, default_scale=2)
 
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    denoised = cv2.medianBlur(gray, 3)
-    thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]
+        thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]
 
-    # Remove small noise using morphological operations
-    kernel = np.ones((1, 1), np.uint8)
-    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-    cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel)
+        # Remove small noise using morphological operations
+        kernel = np.ones((1, 1), np.uint8)
+        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+        cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel)
 
-    return cleaned
+        return cleaned
 
 
 def recognize_text_in_roi(image, roi):
@@ -143,14 +147,7 @@ def recognize_text_in_roi(image, roi):
     x, y, w, h = roi
 
     # Check coordinates
-    if (
-        x >= 0
-        and y >= 0
-        and w > 5
-        and h > 5
-        and x + w <= image.shape[1]
-        and y + h <= image.shape[0]
-    ):
+    if is_valid_roi(image, roi):
         cell_image = image[y : y + h, x : x + w]
 
         # Cell preprocessing to improve recognition
@@ -158,10 +155,7 @@ def recognize_text_in_roi(image, roi):
 
         # Text recognition
         try:
-            text = pytesseract.image_to_string(
-                processed_cell,
-                lang="rus",
-            )
+            text = get_ocr_engine().image_to_string(processed_cell)
 
             # Text cleaning
             text = " ".join(text.split()).strip()
@@ -173,8 +167,127 @@ def recognize_text_in_roi(image, roi):
     return ""
 
 
-def find_cells_in_table(table_region, offset_x=0, offset_y=0):
-    """Find cells in the table"""
+def is_valid_roi(image, roi) -> bool:
+    x, y, w, h = roi
+    return (
+        x >= 0
+        and y >= 0
+        and w > 5
+        and h > 5
+        and x + w <= image.shape[1]
+        and y + h <= image.shape[0]
+    )
+
+
+def recognize_table_cells(image, cell_contours, table_rect) -> Dict[str, str]:
+    """
+    Recognize text of every cell in a table
+
+    In "batched" mode the table region is recognized once and words are
+    assigned to cells by their centers, in "per_cell" mode every cell is a
+    separate OCR call.
+    """
+    cell_rects = [cv2.boundingRect(cell) for cell in cell_contours]
+    texts = recognize_cell_rects(image, cell_rects, table_rect)
+    return {f"cell_{cell_idx}": text for cell_idx, text in enumerate(texts, 1)}
+
+
+def recognize_table_grid(image, grid: List[GridCell], table_rect) -> Dict[str, Any]:
+    """
+    Recognize text of every cell of a table grid
+
+    Besides the usual cell_N keys (in row-major order) the result has "rows",
+    a row x column matrix where a spanning cell is stored at its top-left
+    position, and "spans" listing the cells that cover more than one slot.
+    """
+    texts = recognize_cell_rects(image, [cell.rect for cell in grid], table_rect)
+
+    n_rows = max(cell.row + cell.row_span for cell in grid)
+    n_cols = max(cell.col + cell.col_span for cell in grid)
+    rows = [[""] * n_cols for _ in range(n_rows)]
+    for cell, text in zip(grid, texts, strict=True):
+        rows[cell.row][cell.col] = text
+
+    result: Dict[str, Any] = {f"cell_{cell_idx}": text for cell_idx, text in enumerate(texts, 1)}
+    result["rows"] = rows
+    result["spans"] = [
+        {"row": cell.row, "col": cell.col, "row_span": cell.row_span, "col_span": cell.col_span}
+        for cell in grid
+        if cell.row_span > 1 or cell.col_span > 1
+    ]
+    return result
+
+
+def table_grid_rows(tables: Dict[str, Any]) -> List[List[List[str]]]:
+    """Row matrices of the grid tables in a {table_N: cells} result"""
+    return [
+        table["rows"] for table in tables.values() if isinstance(table, dict) and "rows" in table
+    ]
+
+
+def recognize_cell_rects(image, cell_rects, table_rect) -> List[str]:
+    observe_table_cells(len(cell_rects))
+    with stage_timer("cell_ocr"):
+        if config.TABLE_OCR_MODE == "batched":
+            return recognize_cells_batched(image, table_rect, cell_rects)
+        return [recognize_text_in_roi(image, rect) for rect in cell_rects]
+
+
+def recognize_cells_batched(image, table_rect, cell_rects) -> List[str]:
+    """Recognize a table region in one pass and map the words back to cells"""
+    texts = [""] * len(cell_rects)
+    valid = [i for i, rect in enumerate(cell_rects) if is_valid_roi(image, rect)]
+    if not valid:
+        return texts
+
+    x_t, y_t, w_t, h_t = table_rect
+    table_image = image[y_t : y_t + h_t, x_t : x_t + w_t]
+    if table_image.size == 0:
+        return texts
+
+    processed = preprocess_image(table_image)
+    # preprocessing upscales, word boxes have to be mapped back to page pixels
+    scale_x = processed.shape[1] / table_image.shape[1]
+    scale_y = processed.shape[0] / table_image.shape[0]
+
+    try:
+        words = get_ocr_engine().image_to_words(processed)
+    except Exception as e:
+        logger.info(f"Error recognizing text: {e}")
+        return texts
+
+    if not words:
+        return texts
+
+    centers_x = np.array([x_t + (w.left + w.width / 2) / scale_x for w in words])
+    centers_y = np.array([y_t + (w.top + w.height / 2) / scale_y for w in words])
+
+    for i in valid:
+        x, y, w, h = cell_rects[i]
+        inside = (centers_x >= x) & (centers_x < x + w) & (centers_y >= y) & (centers_y < y + h)
+        # nested boxes get the words of their children, like a per-cell crop would
+        texts[i] = " ".join(words[j].text for j in np.flatnonzero(inside))
+
+    return texts
+
+
+def recognize_table(image, table_region, table_rect) -> Dict[str, Any]:
+    """Find the cells of a table region and recognize their text"""
+    x, y = table_rect[:2]
+    with stage_timer("cell_detection"):
+        grid = []
+        if config.TABLE_GRID_ENGINE == "projection":
+            grid = find_table_grid(table_region, x, y)
+        # no ruling grid (e.g. a table without borders), try the contour search
+        cell_contours = [] if grid else find_cells_in_table(table_region, x, y)
+
+    if grid:
+        return recognize_table_grid(image, grid, table_rect)
+    return recognize_table_cells(image, cell_contours, table_rect)
+
+
+def ruling_line_masks(table_region):
+    """Binary masks of the horizontal and vertical ruling lines of a table"""
     if len(table_region.shape) == 3:
         table_region = cv2.cvtColor(table_region, cv2.COLOR_BGR2GRAY)
 
@@ -191,6 +304,210 @@ def find_cells_in_table(table_region, offset_x=0, offset_y=0):
     horizontal_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel_horizontal)
     vertical_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel_vertical)
 
+    return horizontal_lines, vertical_lines
+
+
+def find_table_grid(table_region, offset_x=0, offset_y=0) -> List[GridCell]:
+    """
+    Find the row x column cell grid of a ruled table
+
+    Ruling lines are located from row/column projections of the line masks,
+    the bands between neighbouring lines give the grid. Two neighbouring
+    slots are merged into one spanning cell when the line segment between
+    them is missing. Returns an empty list when the region has no grid.
+    """
+    horizontal_lines, vertical_lines = ruling_line_masks(table_region)
+    height, width = horizontal_lines.shape
+
+    # even a 1 degree tilt smears a long ruling line over dozens of projection
+    # rows, so the line masks of skewed scans are straightened first
+    rotation = inverse = None
+    angle = estimate_skew(horizontal_lines)
+    if abs(angle) >= 0.2:
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        horizontal_lines = cv2.warpAffine(
+            horizontal_lines, rotation, (width, height), flags=cv2.INTER_NEAREST
+        )
+        vertical_lines = cv2.warpAffine(
+            vertical_lines, rotation, (width, height), flags=cv2.INTER_NEAREST
+        )
+        inverse = cv2.invertAffineTransform(rotation)
+
+    # a ruling line crosses a good part of the table, text strokes do not
+    min_line_fraction = 0.2
+    # lines closer than this are one (thick or doubled) line
+    min_cell_size = 8
+
+    row_lines = find_line_runs(
+        np.count_nonzero(horizontal_lines, axis=1), min_line_fraction * width, min_cell_size
+    )
+    col_lines = find_line_runs(
+        np.count_nonzero(vertical_lines, axis=0), min_line_fraction * height, min_cell_size
+    )
+    # at least two rows and two columns, anything less is a box rather than a table
+    if len(row_lines) < 3 or len(col_lines) < 3:
+        return []
+
+    row_bands = bands_between(row_lines)
+    col_bands = bands_between(col_lines)
+
+    # a separator is present where a line covers most of the band it crosses
+    min_separator_coverage = 0.5
+    # [row, col]: vertical line between col and col + 1 is drawn in this row
+    col_separators = (
+        line_coverage(vertical_lines, col_lines[1:-1], row_bands).T >= min_separator_coverage
+    )
+    # [row, col]: horizontal line between row and row + 1 is drawn in this column
+    row_separators = (
+        line_coverage(horizontal_lines.T, row_lines[1:-1], col_bands) >= min_separator_coverage
+    )
+
+    n_rows, n_cols = len(row_bands), len(col_bands)
+    taken = np.zeros((n_rows, n_cols), dtype=bool)
+    # (row, col, row_span, col_span) and (x, y, w, h) in the straightened region
+    slots = []
+    rects = []
+
+    for row in range(n_rows):
+        for col in range(n_cols):
+            if taken[row, col]:
+                continue
+
+            last_col = col
+            while (
+                last_col + 1 < n_cols
+                and not col_separators[row, last_col]
+                and not taken[row, last_col + 1]
+            ):
+                last_col += 1
+
+            last_row = row
+            while (
+                last_row + 1 < n_rows
+                and not row_separators[last_row, col : last_col + 1].any()
+                and not taken[last_row + 1, col : last_col + 1].any()
+            ):
+                last_row += 1
+
+            taken[row : last_row + 1, col : last_col + 1] = True
+            slots.append((row, col, last_row - row + 1, last_col - col + 1))
+            x = col_bands[col][0]
+            y = row_bands[row][0]
+            rects.append((x, y, col_bands[last_col][1] - x, row_bands[last_row][1] - y))
+
+    rects = np.array(rects)
+    if inverse is not None:
+        rects = unrotate_rects(rects, inverse, table_region.shape)
+    rects += (offset_x, offset_y, 0, 0)
+
+    return [
+        GridCell(row, col, row_span, col_span, tuple(rect))
+        for (row, col, row_span, col_span), rect in zip(slots, rects.tolist(), strict=True)
+    ]
+
+
+def estimate_skew(line_mask, max_angle: float = 3.0, step: float = 0.1) -> float:
+    """
+    Tilt of the horizontal ruling lines in degrees, in the sign convention of
+    cv2.getRotationMatrix2D that straightens them
+
+    Line pixels are sheared by every candidate angle and projected onto rows;
+    the angle that aligns the lines gives the sharpest profile. A coarse pass
+    over the whole range is refined around its best angle.
+    """
+    points = cv2.findNonZero(line_mask)
+    if points is None:
+        return 0.0
+    xs, ys = points.reshape(-1, 2).T
+
+    # a sample of the line pixels is enough to find the peak
+    max_points = 5000
+    if ys.size > max_points:
+        sample = np.linspace(0, ys.size - 1, max_points).astype(np.intp)
+        ys, xs = ys[sample], xs[sample]
+    xs = xs - xs.mean()
+
+    best = 0.0
+    coarse_step = 5 * step
+    for search_step, search_range in ((coarse_step, max_angle), (step, coarse_step)):
+        angles = np.arange(best - search_range, best + search_range + search_step / 2, search_step)
+        rows = np.rint(ys - np.outer(np.tan(np.radians(angles)), xs)).astype(np.intp)
+        rows -= rows.min()
+        span = int(rows.max()) + 1
+        # one bincount for all angles, every angle gets its own range of bins
+        rows += span * np.arange(len(angles))[:, None]
+        profiles = np.bincount(rows.ravel(), minlength=span * len(angles))
+        scores = np.square(profiles.reshape(len(angles), span), dtype=np.float64).sum(axis=1)
+        best = float(angles[np.argmax(scores)])
+
+    return best
+
+
+def unrotate_rects(rects, inverse, shape):
+    """Bounding rects in the original region of rects found in the straightened one"""
+    x, y, w, h = rects.T
+    # (rect, corner, xy)
+    corners = np.stack(
+        [
+            np.stack([x, y], 1),
+            np.stack([x + w, y], 1),
+            np.stack([x, y + h], 1),
+            np.stack([x + w, y + h], 1),
+        ],
+        axis=1,
+    ).astype(np.float64)
+    corners = corners @ inverse[:, :2].T + inverse[:, 2]
+    x0, y0 = np.floor(corners.min(axis=1)).astype(int).T
+    x1, y1 = np.ceil(corners.max(axis=1)).astype(int).T
+    x0, y0 = np.maximum(x0, 0), np.maximum(y0, 0)
+    x1, y1 = np.minimum(x1, shape[1]), np.minimum(y1, shape[0])
+    return np.stack([x0, y0, x1 - x0, y1 - y0], axis=1)
+
+
+def find_line_runs(profile, min_length: float, min_gap: int) -> List[Tuple[int, int]]:
+    """(first, last) index of every run of projection values of at least `min_length`"""
+    idx = np.flatnonzero(profile >= min_length)
+    if idx.size == 0:
+        return []
+
+    breaks = np.flatnonzero(np.diff(idx) > min_gap)
+    starts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    ends = np.concatenate((idx[breaks], [idx[-1]]))
+    return list(zip(starts.tolist(), ends.tolist(), strict=True))
+
+
+def bands_between(lines: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """[start, end) intervals between neighbouring lines"""
+    return [
+        (prev_end + 1, start) for (_, prev_end), (start, _) in zip(lines, lines[1:], strict=False)
+    ]
+
+
+def line_coverage(mask, lines: List[Tuple[int, int]], bands: List[Tuple[int, int]]):
+    """
+    Share of every band (along axis 0 of the mask) covered by every line
+    (a run of columns of the mask), as a len(lines) x len(bands) matrix
+    """
+    if not lines:
+        return np.zeros((0, len(bands)))
+
+    # a couple of pixels of slack for slightly skewed scans
+    slack = 2
+    strips = np.stack(
+        [mask[:, max(0, start - slack) : end + slack + 1].any(axis=1) for start, end in lines]
+    )
+    cumulative = np.zeros((len(lines), mask.shape[0] + 1))
+    np.cumsum(strips, axis=1, out=cumulative[:, 1:])
+
+    starts = np.array([start for start, _ in bands])
+    ends = np.array([end for _, end in bands])
+    return (cumulative[:, ends] - cumulative[:, starts]) / np.maximum(ends - starts, 1)
+
+
+def find_cells_in_table(table_region, offset_x=0, offset_y=0):
+    """Find cells in the table"""
+    horizontal_lines, vertical_lines = ruling_line_masks(table_region)
+
     # Combine vertical and horizontal lines
     grid_lines = cv2.add(horizontal_lines, vertical_lines)
 
@@ -234,31 +551,32 @@ def detect_table_cells_advanced(image):
         image = np.array(image)
         image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    with stage_timer("table_detection"):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Binarization
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        # Binarization
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
-    # Create horizontal and vertical kernels
-    kernel_horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 1))
-    kernel_vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 20))
+        # Create horizontal and vertical kernels
+        kernel_horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 1))
+        kernel_vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 20))
 
-    # Apply morphological operations
-    horizontal = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel_horizontal)
-    vertical = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel_vertical)
+        # Apply morphological operations
+        horizontal = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel_horizontal)
+        vertical = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel_vertical)
 
-    # Combine
-    table_structure = cv2.add(horizontal, vertical)
+        # Combine
+        table_structure = cv2.add(horizontal, vertical)
 
-    # Thicken lines
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-    table_structure = cv2.dilate(table_structure, kernel, iterations=2)
+        # Thicken lines
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+        table_structure = cv2.dilate(table_structure, kernel, iterations=2)
 
-    # Find contours
-    contours, _ = cv2.findContours(table_structure, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Find contours
+        contours, _ = cv2.findContours(table_structure, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Sort contours by area and take the largest ones (presumably tables)
-    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:5]
+        # Sort contours by area and take the largest ones (presumably tables)
+        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:5]
 
     result_dict = {}
 
@@ -281,21 +599,8 @@ def detect_table_cells_advanced(image):
             # Extract table region
             table_region = gray[y_exp : y_exp + h_exp, x_exp : x_exp + w_exp]
 
-            # Find cells within the table
-            cell_contours = find_cells_in_table(table_region, x_exp, y_exp)
-
-            # Recognize text in each cell
-            table_cells_dict = {}
-
-            for cell_idx, cell in enumerate(cell_contours, 1):
-                # Get cell coordinates
-                x_cell, y_cell, w_cell, h_cell = cv2.boundingRect(cell)
-
-                # Recognize text in the cell
-                text = recognize_text_in_roi(image, (x_cell, y_cell, w_cell, h_cell))
-
-                # Add to cells dictionary
-                table_cells_dict[f"cell_{cell_idx}"] = text
+            # Find cells within the table and recognize text in each cell
+            table_cells_dict = recognize_table(image, table_region, (x_exp, y_exp, w_exp, h_exp))
 
             # Add table to result only if it has cells with text
             if table_cells_dict:
@@ -310,30 +615,31 @@ def detect_table_edges_with_ocr(image):
         image = np.array(image)
         image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    with stage_timer("table_detection"):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Apply Canny edge detector
-    edges = cv2.Canny(gray, 50, 150, apertureSize=3)
+        # Apply Canny edge detector
+        edges = cv2.Canny(gray, 50, 150, apertureSize=3)
 
-    # Morphological operations to connect line breaks
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        # Morphological operations to connect line breaks
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+        closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
 
-    # Find contours
-    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Find contours
+        contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Filter contours by area and approximate
-    min_area = 1000  # Minimum contour area
-    table_contours = []
+        # Filter contours by area and approximate
+        min_area = 1000  # Minimum contour area
+        table_contours = []
 
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area > min_area:
-            # Approximate contour to rectangle
-            epsilon = 0.02 * cv2.arcLength(cnt, True)
-            approx = cv2.approxPolyDP(cnt, epsilon, True)
-            if len(approx) == 4:
-                table_contours.append(approx)
+        for cnt in contours:
+            area = cv2.contourArea(cnt)
+            if area > min_area:
+                # Approximate contour to rectangle
+                epsilon = 0.02 * cv2.arcLength(cnt, True)
+                approx = cv2.approxPolyDP(cnt, epsilon, True)
+                if len(approx) == 4:
+                    table_contours.append(approx)
 
     result_dict = {}
 
@@ -352,21 +658,8 @@ def detect_table_edges_with_ocr(image):
         # Extract expanded table region
         table_region = gray[y_exp : y_exp + h_exp, x_exp : x_exp + w_exp]
 
-        # Find cells within the table
-        cell_contours = find_cells_in_table(table_region, x_exp, y_exp)
-
-        # Recognize text in each cell
-        table_cells_dict = {}
-
-        for cell_idx, cell in enumerate(cell_contours, 1):
-            # Get cell coordinates
-            x_cell, y_cell, w_cell, h_cell = cv2.boundingRect(cell)
-
-            # Recognize text in the cell
-            text = recognize_text_in_roi(image, (x_cell, y_cell, w_cell, h_cell))
-
-            # Add to cells dictionary
-            table_cells_dict[f"cell_{cell_idx}"] = text
+        # Find cells within the table and recognize text in each cell
+        table_cells_dict = recognize_table(image, table_region, (x_exp, y_exp, w_exp, h_exp))
 
         # Add table to result only if it has cells with text
         if table_cells_dict:
@@ -375,87 +668,27 @@ def detect_table_edges_with_ocr(image):
     return result_dict
 
 
-def process_pdf_document(pdf_bytes: bytes, method: str = "advanced") -> Dict[str, Any]:
-    """
-    Main function for processing PDF documents with tables
-
-    Args:
-        pdf_bytes: PDF document as bytes
-        method: table detection method ('advanced' or 'edges')
-
-    Returns:
-        Dictionary with recognition results in format:
-        {
-            "page_1": {
-                "table_1": {
-                    "cell_1": "text",
-                    "cell_2": "text",
-                    ...
-                },
-                ...
-            },
-            ...
-        }
-    """
-    # Convert PDF to images
-    images = pdf_bytes_to_images(pdf_bytes)
-
-    if not images:
-        return {"error": "Failed to extract images from PDF"}
-
-    results = {}
-
-    # Process each page
-    for page_num, image in enumerate(images, 1):
-        try:
-            if method == "advanced":
-                page_result = detect_table_cells_advanced(image)
-            else:
-                page_result = detect_table_edges_with_ocr(image)
-
-            if page_result:
-                results[f"page_{page_num}"] = page_result
-            else:
-                results[f"page_{page_num}"] = {"info": "No tables detected"}
+def process_page_tables(image, method: str = "advanced") -> Dict[str, Any]:
+    """Detect tables on a single rendered page and recognize their cells"""
+    try:
+        if method == "advanced":
+            page_result = detect_table_cells_advanced(image)
+        else:
+            page_result = detect_table_edges_with_ocr(image)
 
-        except Exception as e:
-            results[f"page_{page_num}"] = {"error": f"Processing error: {str(e)}"}
+        if page_result:
+            return page_result
+        return {"info": "No tables detected"}
 
-    return results
+    except Exception as e:
+        return {"error": f"Processing error: {str(e)}"}
 
 
 def process_pic(pic_bytes: bytes):
-    image = bytes_to_image(pic_bytes=pic_bytes)
+    image = pic_bytes if isinstance(pic_bytes, Image.Image) else bytes_to_image(pic_bytes)
     result = detect_table_cells_advanced(image)
     return {
         "success": True,
         "data": result,
         "message": "Processing completed successfully",
     }
-
-
-# Example usage in web application
-def handle_pdf_upload(pdf_bytes: bytes) -> Dict[str, Any]:
-    """
-    Function for processing uploaded PDF in web application
-
-    Args:
-        pdf_bytes: PDF file as bytes
-
-    Returns:
-        Dictionary with recognition results
-    """
-    try:
-        # Process PDF
-        result = process_pdf_document(pdf_bytes, method="advanced")
-        return {
-            "success": True,
-            "data": result,
-            "message": "Processing completed successfully",
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "data": {},
-            "message": f"Error processing PDF: {str(e)}",
-        }
@@ -7,6 +7,7 @@ class OCRScannerServiceResponse(BaseModel):
     status: Literal["success", "error"]
     data: dict
     tables: list
+    pages: list = []
     message: Optional[str] = None
 
     class Config:
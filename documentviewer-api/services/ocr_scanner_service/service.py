@@ -1,14 +1,128 @@
-import io
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import pdfplumber
 
+from services.metrics_service import stage_timer
+from services.upload_spool_service import DocumentSource, open_source
+
 from .schemas import OCRScannerServiceResponse
 
 
+class TextField(NamedTuple):
+    pattern: "re.Pattern[str]"
+    # lowercase literals every match starts with, None if the pattern has no literal start
+    prefixes: Optional[Tuple[str, ...]]
+
+
+class KeywordMatcher:
+    """Finds any of several keywords in a string with a single compiled search"""
+
+    def __init__(self, *keywords: str):
+        self._pattern = re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+    def search(self, text: str) -> bool:
+        return self._pattern.search(text) is not None
+
+    def find_index(self, texts: List[str]) -> Optional[int]:
+        for i, text in enumerate(texts):
+            if self._pattern.search(text) is not None:
+                return i
+        return None
+
+
+FIELD_FLAGS = re.IGNORECASE | re.MULTILINE
+
+TEXT_FIELDS = {
+    "supplier_inn": TextField(re.compile(r"ИНН\s*(\d{10,12})", FIELD_FLAGS), ("инн",)),
+    "supplier_name": TextField(re.compile(r"Поставщик[:\s]+([^\n]+)", FIELD_FLAGS), ("поставщик",)),
+    "buyer_name": TextField(
+        re.compile(r"(?:Плательщик|Покупатель|Заказчик)[:\s]+([^\n]+)", FIELD_FLAGS),
+        ("плательщик", "покупатель", "заказчик"),
+    ),
+    "amount": TextField(
+        re.compile(r"(?:Сумма|Итого)\s*[:\s]*([\d\s,]+(?:\s*руб)?)", FIELD_FLAGS),
+        ("сумма", "итого"),
+    ),
+    "invoice_number": TextField(
+        re.compile(r"(?:Счет|Счёт)[\s№]*([^\n]+)", FIELD_FLAGS), ("счет", "счёт")
+    ),
+    "date": TextField(re.compile(r"(\d{2}\.\d{2}\.\d{4})", FIELD_FLAGS), None),
+    "bank_account": TextField(
+        re.compile(r"(?:р\/с|расч[ёе]тный сч[ёе]т)\s*([^\n]+)", FIELD_FLAGS),
+        ("р/с", "расчетный", "расчётный"),
+    ),
+    "bik": TextField(re.compile(r"БИК\s*(\d{9})", FIELD_FLAGS), ("бик",)),
+    "contract_number": TextField(
+        re.compile(r"(?:Договор|Дог\.)\s*[№\s]*([^\n]+)", FIELD_FLAGS), ("договор", "дог.")
+    ),
+}
+
+PRODUCT_KEYWORDS = KeywordMatcher("товар", "услуга", "наименование", "описание", "артикул")
+PRICE_KEYWORDS = KeywordMatcher("цена", "стоимость", "сумма", "итого", "всего")
+QUANTITY_KEYWORDS = KeywordMatcher("количество", "кол-во", "шт", "кг")
+BANK_DETAILS_KEYWORDS = KeywordMatcher("реквизит", "банк", "счет", "бик")
+TOTALS_KEYWORDS = KeywordMatcher("итого", "всего", "сумма")
+
+NAME_COLUMN = KeywordMatcher("наименование", "товар", "услуга", "описание")
+QUANTITY_COLUMN = KeywordMatcher("количество", "кол-во", "шт")
+PRICE_COLUMN = KeywordMatcher("цена", "стоимость")
+AMOUNT_COLUMN = KeywordMatcher("сумма", "amount", "итого")
+
+
 class OCRScannerService:
-    def process_pdf(self, pdf_bytes: bytes) -> OCRScannerServiceResponse:
+    def process_pdf(self, pdf_source: DocumentSource) -> OCRScannerServiceResponse:
+        try:
+            pages = self.extract_pages(pdf_source)
+        except Exception as e:
+            return OCRScannerServiceResponse(
+                status="error",
+                data={},
+                tables=[],
+                message=f"Ошибка обработки PDF: {str(e)}",
+            )
+
+        return self.build_result(pages)
+
+    def count_pages(self, pdf_source: DocumentSource) -> int:
+        with pdfplumber.open(open_source(pdf_source)) as pdf:
+            return len(pdf.pages)
+
+    def extract_pages(
+        self, pdf_source: DocumentSource, page_numbers: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """pdfplumber pass over the given 1-based pages, the whole document by default"""
+        with stage_timer("pdfplumber"), pdfplumber.open(open_source(pdf_source)) as pdf:
+            if page_numbers is None:
+                page_numbers = range(1, len(pdf.pages) + 1)
+            return [
+                self.extract_page(pdf.pages[page_num - 1], page_num) for page_num in page_numbers
+            ]
+
+    def extract_page(self, page: Any, page_num: int) -> Dict[str, Any]:
+        page_text = page.extract_text()
+        page_tables = page.extract_tables()
+
+        tables = []
+        for table_num, table in enumerate(page_tables):
+            if table and any(any(cell is not None for cell in row) for row in table):
+                cleaned_table = self.clean_table(table)
+                if cleaned_table:
+                    table_info = {
+                        "page": page_num,
+                        "table_number": table_num + 1,
+                        "data": cleaned_table,
+                        "type": self.detect_table_type(cleaned_table),
+                    }
+                    tables.append(table_info)
+
+        return {
+            "info": self.describe_text_layer(page, page_num, page_text),
+            "tables": tables,
+        }
+
+    def build_result(self, pages: List[Dict[str, Any]]) -> OCRScannerServiceResponse:
+        """Merge page extractions (in page order) into structured fields"""
         result = OCRScannerServiceResponse(
             status="success",
             data={},
@@ -17,43 +131,32 @@ class OCRScannerService:
         special_word = "<UNKNOWN>"
 
         try:
-            pdf_file = io.BytesIO(pdf_bytes)
-
             full_text = ""
             all_tables = []
+            pages_info = []
 
-            with pdfplumber.open(pdf_file) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += f"\n--- Страница {page_num + 1} ---\n{page_text}"
-                    page_tables = page.extract_tables()
-
-                    for table_num, table in enumerate(page_tables):
-                        if table and any(any(cell is not None for cell in row) for row in table):
-                            cleaned_table = self.clean_table(table)
-                            if cleaned_table:
-                                table_info = {
-                                    "page": page_num + 1,
-                                    "table_number": table_num + 1,
-                                    "data": cleaned_table,
-                                    "type": self.detect_table_type(cleaned_table),
-                                }
-                                all_tables.append(table_info)
+            for page in pages:
+                page_info = page["info"]
+                if page_info["text"]:
+                    full_text += f"\n--- Страница {page_info['page']} ---\n{page_info['text']}"
+                pages_info.append(page_info)
+                all_tables.extend(page["tables"])
 
             if not full_text and not all_tables:
                 result.status = "error"
                 result.message = "Не удалось извлечь данные из PDF"
                 return result
 
-            extracted_data = self.parse_text_fields(full_text)
+            with stage_timer("field_extraction"):
+                extracted_data = self.parse_text_fields(full_text)
 
-            table_data = self.process_tables(all_tables, full_text)
+                table_data = self.process_tables(all_tables, full_text)
 
-            merged_data = self.merge_data(extracted_data, table_data)
+                merged_data = self.merge_data(extracted_data, table_data)
 
-            result.data = self.build_structured_result(merged_data, special_word)
+                result.data = self.build_structured_result(merged_data, special_word)
             result.tables = all_tables
+            result.pages = pages_info
 
         except Exception as e:
             result.status = "error"
@@ -61,6 +164,25 @@ class OCRScannerService:
 
         return result
 
+    def describe_text_layer(
+        self, page: Any, page_num: int, page_text: Optional[str]
+    ) -> Dict[str, Any]:
+        """Text layer statistics used to decide whether a page needs OCR"""
+        char_count = 0
+        char_area = 0.0
+        for char in page.chars:
+            if char["text"].strip():
+                char_count += 1
+                char_area += (char["x1"] - char["x0"]) * (char["bottom"] - char["top"])
+
+        page_area = float(page.width * page.height) or 1.0
+        return {
+            "page": page_num,
+            "text": page_text or "",
+            "char_count": char_count,
+            "coverage": char_area / page_area,
+        }
+
     def clean_table(self, table: List[List[Optional[str]]]) -> List[List[str]]:
         cleaned = []
         for row in table:
@@ -83,43 +205,53 @@ class OCRScannerService:
 
         headers = " ".join(table_data[0]).lower()
 
-        product_keywords = ["товар", "услуга", "наименование", "описание", "артикул"]
-        price_keywords = ["цена", "стоимость", "сумма", "итого", "всего"]
-        quantity_keywords = ["количество", "кол-во", "шт", "кг"]
-
-        has_products = any(keyword in headers for keyword in product_keywords)
-        has_prices = any(keyword in headers for keyword in price_keywords)
-        has_quantity = any(keyword in headers for keyword in quantity_keywords)
+        has_products = PRODUCT_KEYWORDS.search(headers)
 
-        if has_products and (has_prices or has_quantity):
+        if has_products and (PRICE_KEYWORDS.search(headers) or QUANTITY_KEYWORDS.search(headers)):
             return "products"
-        elif any(word in headers for word in ["реквизит", "банк", "счет", "бик"]):
+        elif BANK_DETAILS_KEYWORDS.search(headers):
             return "bank_details"
-        elif any(word in headers for word in ["итого", "всего", "сумма"]):
+        elif TOTALS_KEYWORDS.search(headers):
             return "totals"
         else:
             return "general"
 
     def parse_text_fields(self, text: str) -> Dict[str, Any]:
-        patterns = {
-            "supplier_inn": r"ИНН\s*(\d{10,12})",
-            "supplier_name": r"Поставщик[:\s]+([^\n]+)",
-            "buyer_name": r"(?:Плательщик|Покупатель|Заказчик)[:\s]+([^\n]+)",
-            "amount": r"(?:Сумма|Итого)\s*[:\s]*([\d\s,]+(?:\s*руб)?)",
-            "invoice_number": r"(?:Счет|Счёт)[\s№]*([^\n]+)",
-            "date": r"(\d{2}\.\d{2}\.\d{4})",
-            "bank_account": r"(?:р\/с|расч[ёе]тный сч[ёе]т)\s*([^\n]+)",
-            "bik": r"БИК\s*(\d{9})",
-            "contract_number": r"(?:Договор|Дог\.)\s*[№\s]*([^\n]+)",
-        }
+        # Patterns are only tried where one of their literal prefixes occurs, the
+        # prefixes are found with str.find in a single lowercase copy of the text
+        lowered = text.lower()
+        # lower() changes the length of a few non-Cyrillic characters, offsets would drift
+        use_prefixes = len(lowered) == len(text)
 
         extracted_data = {}
-        for field, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        for field, text_field in TEXT_FIELDS.items():
+            if use_prefixes and text_field.prefixes:
+                match = self.search_after_prefixes(text, lowered, text_field)
+            else:
+                match = text_field.pattern.search(text)
             extracted_data[field] = match.group(1).strip() if match else None
 
         return extracted_data
 
+    def search_after_prefixes(
+        self, text: str, lowered: str, text_field: TextField
+    ) -> Optional["re.Match[str]"]:
+        """Leftmost match of the field pattern, same as pattern.search(text)"""
+        positions = {prefix: lowered.find(prefix) for prefix in text_field.prefixes}
+        while True:
+            candidates = [pos for pos in positions.values() if pos >= 0]
+            if not candidates:
+                return None
+
+            pos = min(candidates)
+            match = text_field.pattern.match(text, pos)
+            if match:
+                return match
+
+            for prefix, prefix_pos in positions.items():
+                if prefix_pos == pos:
+                    positions[prefix] = lowered.find(prefix, pos + 1)
+
     def process_tables(self, tables: List[Dict], full_text: str) -> Dict[str, Any]:
         table_data = {"products": [], "bank_details": {}, "totals": {}}
 
@@ -144,6 +276,18 @@ class OCRScannerService:
 
         return table_data
 
+    def process_ocr_tables(self, tables: List[List[List[str]]]) -> Dict[str, Any]:
+        """Products, bank details and totals from table grids recognized by OCR"""
+        with stage_timer("field_extraction"):
+            table_infos = []
+            for table in tables:
+                cleaned_table = self.clean_table(table)
+                if cleaned_table:
+                    table_infos.append(
+                        {"data": cleaned_table, "type": self.detect_table_type(cleaned_table)}
+                    )
+            return self.process_tables(table_infos, "")
+
     def extract_products_from_table(self, table: List[List[str]]) -> List[Dict[str, Any]]:
         products = []
 
@@ -152,10 +296,10 @@ class OCRScannerService:
 
         headers = [h.lower() for h in table[0]]
 
-        name_col = self.find_column_index(headers, ["наименование", "товар", "услуга", "описание"])
-        quantity_col = self.find_column_index(headers, ["количество", "кол-во", "шт"])
-        price_col = self.find_column_index(headers, ["цена", "стоимость"])
-        amount_col = self.find_column_index(headers, ["сумма", "amount", "итого"])
+        name_col = NAME_COLUMN.find_index(headers)
+        quantity_col = QUANTITY_COLUMN.find_index(headers)
+        price_col = PRICE_COLUMN.find_index(headers)
+        amount_col = AMOUNT_COLUMN.find_index(headers)
 
         for row in table[1:]:
             if not any(cell.strip() for cell in row if cell):
@@ -213,12 +357,6 @@ class OCRScannerService:
 
         return totals
 
-    def find_column_index(self, headers: List[str], keywords: List[str]) -> Optional[int]:
-        for i, header in enumerate(headers):
-            if any(keyword in header for keyword in keywords):
-                return i
-        return None
-
     def merge_data(self, text_data: Dict[str, Any], table_data: Dict[str, Any]) -> Dict[str, Any]:
         merged = text_data.copy()
 
@@ -273,19 +411,23 @@ class OCRScannerService:
         return result
 
     def remove_unknown_values(self, data: Any, special_word: str) -> Any:
+        # every child is pruned once, then dropped if nothing is left of it
         if isinstance(data, dict):
-            return {
-                k: self.remove_unknown_values(v, special_word)
-                for k, v in data.items()
-                if v != special_word
-                and self.remove_unknown_values(v, special_word) not in [None, "", {}]
-            }
+            pruned = {}
+            for k, v in data.items():
+                if v == special_word:
+                    continue
+                v = self.remove_unknown_values(v, special_word)
+                if v not in (None, "", {}):
+                    pruned[k] = v
+            return pruned
         elif isinstance(data, list):
-            return [
-                self.remove_unknown_values(item, special_word)
-                for item in data
-                if self.remove_unknown_values(item, special_word) not in [None, "", {}]
-            ]
+            pruned = []
+            for item in data:
+                item = self.remove_unknown_values(item, special_word)
+                if item not in (None, "", {}):
+                    pruned.append(item)
+            return pruned
         else:
             return data
 
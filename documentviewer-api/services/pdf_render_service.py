@@ -0,0 +1,51 @@
+import os
+
+import pdf2image
+from loguru import logger
+from PIL import Image
+
+from services.metrics_service import stage_timer
+
+DEFAULT_DPI = 300
+
+if os.name == "nt":
+    poppler_path = r"D:\poopler\poppler-25.11.0\Library\bin"
+else:
+    poppler_path = None
+
+
+class PageRenderError(Exception):
+    """Raised when poppler fails to read or render the document"""
+
+
+def count_pages(pdf_path: str) -> int:
+    """Page count as seen by poppler"""
+    try:
+        info = pdf2image.pdfinfo_from_path(pdf_path, poppler_path=poppler_path)
+    except Exception as e:
+        raise PageRenderError(str(e)) from e
+    return int(info["Pages"])
+
+
+def render_page(pdf_path: str, page_num: int, dpi: int = DEFAULT_DPI) -> Image.Image:
+    """
+    Render page `page_num` (1-based) alone.
+
+    Every pool task renders only the page it works on, so peak memory depends
+    on the number of workers, not on the page count of the document.
+    """
+    try:
+        with stage_timer("rasterize"):
+            images = pdf2image.convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                first_page=page_num,
+                last_page=page_num,
+                poppler_path=poppler_path,
+            )
+    except Exception as e:
+        raise PageRenderError(str(e)) from e
+    if not images:
+        raise PageRenderError(f"Page {page_num} is out of range")
+    logger.debug(f"Rendered page {page_num} at {dpi} DPI")
+    return images[0]
@@ -0,0 +1,9 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class PipelineResult(BaseModel):
+    status: Literal["success", "error"]
+    message: str
+    data: dict
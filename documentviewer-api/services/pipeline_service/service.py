@@ -0,0 +1,285 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+
+from core.config import config
+from services.ocr_image_service import table_grid_rows
+from services.ocr_scanner_service.schemas import OCRScannerServiceResponse
+from services.pdf_render_service import PageRenderError
+from services.process_pool_service import process_pool_service
+
+from .schemas import PipelineResult
+from .stages import (
+    build_scan_result,
+    count_pdf_pages,
+    count_pdf_text_pages,
+    detect_pdf_page_tables,
+    ocr_pdf_page,
+    process_image_upload,
+    scan_pdf,
+    scan_pdf_pages,
+    structure_ocr_tables,
+)
+
+T = TypeVar("T")
+
+
+class PipelineTracker:
+    """Receives the progress of a running pipeline; the base class ignores it"""
+
+    def set_pages(self, total: int) -> None:
+        pass
+
+    def page_done(self, page_num: int, status: str = "done") -> None:
+        pass
+
+    def page_result(self, page_num: int, result: Dict[str, Any]) -> None:
+        """Called with the result of every page as soon as the page is finished"""
+        pass
+
+    def add_timing(self, stage: str, seconds: float) -> None:
+        pass
+
+    def set_outcome(self, outcome: str) -> None:
+        pass
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start_time)
+
+
+async def run_pdf_pipeline(
+    file_path: str, tracker: Optional[PipelineTracker] = None, page_count: int = 0
+) -> PipelineResult:
+    """
+    Process an uploaded PDF.
+
+    Every stage runs in the process pool: pdfplumber first, then per-page OCR
+    of either the whole text or, when pdfplumber found nothing, the tables.
+    Pages of multi-page documents are fanned out to several workers and
+    merged back in page order. `page_count` is the count admission already
+    took, the document is only counted again when it is 0.
+    """
+    tracker = tracker or PipelineTracker()
+
+    # with tables
+    with tracker.stage("pdfplumber"):
+        result = await scan_text_layer(file_path, page_count)
+
+    if result.status == "error":
+        logger.debug(f"pdfplumber extraction failed ({result.message}), falling back to OCR")
+        tracker.set_outcome("fallback")
+        # only if text-like pdf
+        with tracker.stage("table_ocr"):
+            data = await detect_tables(file_path, tracker, page_count)
+        # only clean results are reported as success, and only those are cached
+        failure = table_ocr_failure(data)
+        if failure:
+            return PipelineResult(status="error", message=failure, data=data)
+        return PipelineResult(status="success", message="success", data=data)
+
+    # all text
+    with tracker.stage("text_ocr"):
+        result.data["whole text"], failed_pages = await assemble_whole_text(
+            file_path, result.pages, tracker, result.tables
+        )
+    if failed_pages:
+        return PipelineResult(
+            status="error",
+            message=f"OCR failed on pages {', '.join(map(str, failed_pages))}",
+            data=result.data,
+        )
+
+    return PipelineResult(
+        status=result.status,
+        message=result.message or "File successfully processed",
+        data=result.data,
+    )
+
+
+async def run_image_pipeline(
+    file_path: str, tracker: Optional[PipelineTracker] = None
+) -> PipelineResult:
+    tracker = tracker or PipelineTracker()
+    tracker.set_pages(1)
+    with tracker.stage("image_ocr"):
+        result = await process_pool_service.run(process_image_upload, file_path, wait=True)
+    tracker.page_done(1)
+    return result
+
+
+def page_parallelism() -> int:
+    return config.PAGE_PARALLELISM or process_pool_service.max_workers
+
+
+async def map_pages(
+    page_numbers: List[int], process_page: Callable[[int], Awaitable[T]]
+) -> List[T]:
+    """Run `process_page` for every page concurrently, results keep the page order"""
+    semaphore = asyncio.Semaphore(page_parallelism())
+
+    async def run_page(page_num: int) -> T:
+        async with semaphore:
+            return await process_page(page_num)
+
+    return await asyncio.gather(*(run_page(page_num) for page_num in page_numbers))
+
+
+async def scan_text_layer(file_path: str, page_count: int = 0) -> OCRScannerServiceResponse:
+    """pdfplumber extraction, split into page chunks for multi-page documents"""
+    parallelism = page_parallelism()
+    if parallelism == 1:
+        page_count = 0
+    elif not page_count:
+        page_count = await process_pool_service.run(count_pdf_text_pages, file_path, wait=True)
+
+    if page_count < 2:
+        return await process_pool_service.run(scan_pdf, file_path, wait=True)
+
+    # contiguous chunks, one per worker, so every worker opens the document once
+    chunk_size = -(-page_count // parallelism)
+    chunks = [
+        list(range(first, min(first + chunk_size, page_count + 1)))
+        for first in range(1, page_count + 1, chunk_size)
+    ]
+    try:
+        scanned = await asyncio.gather(
+            *(
+                process_pool_service.run(scan_pdf_pages, file_path, chunk, wait=True)
+                for chunk in chunks
+            )
+        )
+    except Exception as e:
+        logger.debug(f"Parallel pdfplumber scan failed ({e}), scanning sequentially")
+        return await process_pool_service.run(scan_pdf, file_path, wait=True)
+
+    pages = [page for chunk in scanned for page in chunk]
+    return await process_pool_service.run(build_scan_result, pages, wait=True)
+
+
+def has_text_layer(page_info: Dict[str, Any]) -> bool:
+    """Born-digital pages carry enough extractable text to skip OCR"""
+    return (
+        page_info["char_count"] >= config.TEXT_LAYER_MIN_CHARS
+        and page_info["coverage"] >= config.TEXT_LAYER_MIN_COVERAGE
+    )
+
+
+async def assemble_whole_text(
+    file_path: str,
+    pages_info: List[Dict[str, Any]],
+    tracker: PipelineTracker,
+    tables: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[str, List[int]]:
+    """
+    Join the text of every page, OCRing only the pages without a usable text
+    layer; also returns the pages whose OCR failed
+    """
+    tracker.set_pages(len(pages_info))
+    pages_by_num = {page_info["page"]: page_info for page_info in pages_info}
+    failed_pages: List[int] = []
+
+    def finish_page(page_num: int, status: str, text: str) -> str:
+        tracker.page_done(page_num, status)
+        page_tables = [table for table in tables or [] if table["page"] == page_num]
+        tracker.page_result(page_num, {"source": status, "text": text, "tables": page_tables})
+        return text
+
+    async def page_text(page_num: int) -> str:
+        page_info = pages_by_num[page_num]
+        if has_text_layer(page_info):
+            return finish_page(page_num, "text_layer", page_info["text"])
+
+        logger.debug(f"Page {page_num} has no usable text layer, running OCR")
+        try:
+            text = await process_pool_service.run(ocr_pdf_page, file_path, page_num, wait=True)
+            return finish_page(page_num, "ocr", text)
+        except PageRenderError as e:
+            logger.error(f"Error rendering page {page_num}: {e}")
+            failed_pages.append(page_num)
+            return finish_page(page_num, "error", page_info["text"])
+
+    texts = await map_pages(list(pages_by_num), page_text)
+    return "\n".join(texts), sorted(failed_pages)
+
+
+async def detect_tables(
+    file_path: str, tracker: PipelineTracker, page_count: int = 0
+) -> Dict[str, Any]:
+    """Page-by-page table OCR, one result per page keyed page_<n>"""
+    try:
+        try:
+            if not page_count:
+                page_count = await process_pool_service.run(count_pdf_pages, file_path, wait=True)
+        except PageRenderError as e:
+            logger.error(f"Error converting PDF: {e}")
+            page_count = 0
+
+        page_results = []
+        if not page_count:
+            results = {"error": "Failed to extract images from PDF"}
+        else:
+            tracker.set_pages(page_count)
+
+            async def page_tables(page_num: int) -> Dict[str, Any]:
+                page_result = await detect_page_tables(file_path, page_num)
+                tracker.page_done(page_num, "error" if "error" in page_result else "done")
+                tracker.page_result(page_num, {"source": "table_ocr", "tables": page_result})
+                return page_result
+
+            page_numbers = list(range(1, page_count + 1))
+            page_results = await map_pages(page_numbers, page_tables)
+            results = {
+                f"page_{page_num}": page_result
+                for page_num, page_result in zip(page_numbers, page_results, strict=True)
+            }
+
+        response = {
+            "success": True,
+            "data": results,
+            "message": "Processing completed successfully",
+        }
+
+        # grid tables have real rows, run them through the same field extraction
+        # as the pdfplumber tables
+        tables = [table for page_result in page_results for table in table_grid_rows(page_result)]
+        if tables:
+            response["table_data"] = await process_pool_service.run(
+                structure_ocr_tables, tables, wait=True
+            )
+        return response
+    except Exception as e:
+        return {
+            "success": False,
+            "data": {},
+            "message": f"Error processing PDF: {str(e)}",
+        }
+
+
+def table_ocr_failure(response: Dict[str, Any]) -> Optional[str]:
+    """Why a detect_tables response is not a clean result, None if it is"""
+    if not response["success"]:
+        return response["message"]
+    results = response["data"]
+    if "error" in results:
+        return results["error"]
+    failed = [key for key, page_result in results.items() if "error" in page_result]
+    if failed:
+        return f"Table OCR failed on {', '.join(failed)}"
+    return None
+
+
+async def detect_page_tables(file_path: str, page_num: int) -> Dict[str, Any]:
+    try:
+        return await process_pool_service.run(
+            detect_pdf_page_tables, file_path, page_num, wait=True
+        )
+    except PageRenderError as e:
+        return {"error": f"Processing error: {str(e)}"}
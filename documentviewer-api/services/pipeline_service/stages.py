@@ -0,0 +1,83 @@
+"""
+Upload processing stages.
+
+Functions in this module are executed inside process pool workers, so they
+must stay top-level (picklable) and must not touch the event loop. Uploads
+are passed as the path of their spooled file, workers read it themselves.
+"""
+
+from typing import Any, Dict, List
+
+from PIL import Image
+
+from services.ocr_image_service import (
+    process_image_all_text_for_image,
+    process_page_all_text,
+    process_page_tables,
+    process_pic,
+    table_grid_rows,
+)
+from services.ocr_scanner_service.schemas import OCRScannerServiceResponse
+from services.ocr_scanner_service.service import ocr_scanner_service
+from services.pdf_render_service import count_pages, render_page
+
+from .schemas import PipelineResult
+
+
+def scan_pdf(file_path: str) -> OCRScannerServiceResponse:
+    """Text layer and tables extracted by pdfplumber"""
+    return ocr_scanner_service.process_pdf(file_path)
+
+
+def count_pdf_text_pages(file_path: str) -> int:
+    """Page count as seen by pdfplumber, 0 if it cannot open the document"""
+    try:
+        return ocr_scanner_service.count_pages(file_path)
+    except Exception:
+        return 0
+
+
+def scan_pdf_pages(file_path: str, page_numbers: List[int]) -> List[Dict[str, Any]]:
+    """pdfplumber extraction of a subset of pages"""
+    return ocr_scanner_service.extract_pages(file_path, page_numbers)
+
+
+def build_scan_result(pages: List[Dict[str, Any]]) -> OCRScannerServiceResponse:
+    return ocr_scanner_service.build_result(pages)
+
+
+def count_pdf_pages(file_path: str) -> int:
+    return count_pages(file_path)
+
+
+def ocr_pdf_page(file_path: str, page_num: int) -> str:
+    """Render a single page and recognize all of its text"""
+    with render_page(file_path, page_num) as image:
+        return process_page_all_text(image)
+
+
+def detect_pdf_page_tables(file_path: str, page_num: int) -> Dict[str, Any]:
+    """Render a single page and recognize the cells of its tables"""
+    with render_page(file_path, page_num) as image:
+        return process_page_tables(image, method="advanced")
+
+
+def structure_ocr_tables(tables: List[List[List[str]]]) -> Dict[str, Any]:
+    """Products, bank details and totals from OCRed table grids"""
+    return ocr_scanner_service.process_ocr_tables(tables)
+
+
+def process_image_upload(file_path: str) -> PipelineResult:
+    # decode once, both stages work on the same image
+    with Image.open(file_path) as image:
+        image.load()
+        result = process_pic(image)
+        tables = table_grid_rows(result["data"])
+        if tables:
+            result["table_data"] = structure_ocr_tables(tables)
+        result["data"]["whole_text"] = process_image_all_text_for_image(image)
+    return PipelineResult(
+        status="success",
+        message="Image successfully processed",
+        data=result,
+    )
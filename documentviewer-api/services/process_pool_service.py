@@ -0,0 +1,208 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from core.config import config
+from services.metrics_service import (
+    POOL_RESTARTS,
+    Observation,
+    collect_observations,
+    record_observations,
+)
+from services.ocr_engine_service import warm_up_ocr_engine
+
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        super().__init__(f"Processing pool is saturated ({capacity} tasks in flight)")
+
+
+class ResourceUsage:
+    """Peak worker memory of the pool tasks run on behalf of one request"""
+
+    def __init__(self):
+        self.peak_rss_bytes: Optional[int] = None
+
+    def record(self, peak_rss_bytes: Optional[int]) -> None:
+        if peak_rss_bytes is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, peak_rss_bytes)
+
+
+# set by the caller, every pool task run in this context reports its peak RSS here
+resource_usage: ContextVar[Optional[ResourceUsage]] = ContextVar("resource_usage", default=None)
+
+
+def _reset_peak_rss() -> None:
+    # Linux only: resets VmHWM so that it measures the next task alone
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _run_tracked(
+    fn: Callable[..., Any], *args: Any
+) -> Tuple[Any, Optional[int], List[Observation]]:
+    """
+    Executed in the worker: runs the task and reports the peak RSS it reached
+    along with the metric observations it made
+    """
+    _reset_peak_rss()
+    with collect_observations() as observations:
+        result = fn(*args)
+    return result, _peak_rss(), observations
+
+
+class ProcessPoolService:
+    """
+    Bounded process pool for CPU-bound OCR and PDF stages.
+
+    At most `max_workers` tasks run at once, up to `max_queue` more wait for a
+    free worker, everything beyond that is rejected with PoolSaturatedError.
+
+    A worker that dies (OOM killer, a crash in poppler or Tesseract) breaks the
+    whole executor; the tasks that were running on it fail and the executor is
+    replaced, so later work is not affected.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self.restarts = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        self._slots = asyncio.Semaphore(self.capacity)
+        self._executor = self._create_executor()
+        logger.info(
+            f"Process pool started: {self.max_workers} workers, queue size {self.max_queue}"
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        logger.info("Process pool stopped")
+
+    @property
+    def healthy(self) -> bool:
+        # _broken is set by the executor once one of its workers died
+        return self._executor is None or not getattr(self._executor, "_broken", False)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, wait: bool = False) -> Any:
+        """
+        Run `fn(*args)` in a worker process without blocking the event loop.
+
+        New work is rejected when the pool is saturated; `wait=True` is meant for
+        follow-up stages of already admitted work and waits for a free slot instead.
+        """
+        if self._executor is None:
+            self.start()
+
+        if not wait and self._in_flight >= self.capacity:
+            logger.warning(f"Process pool saturated: {self._in_flight} tasks in flight")
+            raise PoolSaturatedError(self.capacity)
+
+        self._in_flight += 1
+        try:
+            async with self._slots:
+                executor = self._executor
+                loop = asyncio.get_running_loop()
+                try:
+                    result, peak_rss, observations = await loop.run_in_executor(
+                        executor, _run_tracked, fn, *args
+                    )
+                except BrokenProcessPool:
+                    self._replace_broken(executor)
+                    raise
+        finally:
+            self._in_flight -= 1
+
+        record_observations(observations)
+
+        usage = resource_usage.get()
+        if usage is not None:
+            usage.record(peak_rss)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "in_flight": self._in_flight,
+            "healthy": self.healthy,
+            "restarts": self.restarts,
+        }
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn keeps workers free of the event loop threads and open sockets
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self.initializer,
+        )
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> None:
+        # every task of the broken executor ends up here, restart it only once
+        if executor is not self._executor:
+            return
+        logger.error("A pool worker died, restarting the process pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create_executor()
+        self.restarts += 1
+        POOL_RESTARTS.inc()
+
+
+def init_worker() -> None:
+    """Process pool initializer: set up the API log sinks, then warm up the OCR engine"""
+    # spawned workers start with loguru's default DEBUG handler on stderr
+    import core.logger  # noqa: F401
+
+    warm_up_ocr_engine()
+
+
+process_pool_service = ProcessPoolService(
+    max_workers=config.OCR_POOL_WORKERS,
+    max_queue=config.OCR_POOL_QUEUE_SIZE,
+    # every worker logs like the API process and keeps its own long-lived OCR engine
+    initializer=init_worker,
+)
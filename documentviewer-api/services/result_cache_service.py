@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from core.config import config
+
+
+class ResultCache:
+    """
+    Content-addressed cache of processing results.
+
+    Keys are sha256 of the upload digest plus a fingerprint of every option
+    that changes the output. Entries live in a bounded in-memory LRU backed by
+    a directory of JSON files with a size cap and TTL.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_entries: int,
+        disk_dir: Optional[str],
+        disk_max_bytes: int,
+        ttl: int,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def options_fingerprint(kind: str) -> str:
+        options = {
+            "kind": kind,
+            "version": config.VERSION,
+            "ocr_engine": config.OCR_ENGINE,
+            "ocr_lang": config.OCR_LANG,
+            "table_ocr_mode": config.TABLE_OCR_MODE,
+            "table_grid_engine": config.TABLE_GRID_ENGINE,
+            "text_layer_min_chars": config.TEXT_LAYER_MIN_CHARS,
+            "text_layer_min_coverage": config.TEXT_LAYER_MIN_COVERAGE,
+            "ocr_scale_mode": config.OCR_SCALE_MODE,
+            "ocr_target_text_height": config.OCR_TARGET_TEXT_HEIGHT,
+            "ocr_min_scale": config.OCR_MIN_SCALE,
+            "ocr_max_scale": config.OCR_MAX_SCALE,
+            "ocr_max_pixels": config.OCR_MAX_PIXELS,
+        }
+        return json.dumps(options, sort_keys=True)
+
+    def make_key(self, kind: str, content_sha256: str) -> str:
+        # the upload itself is hashed while it is spooled to disk
+        digest = hashlib.sha256(self.options_fingerprint(kind).encode())
+        digest.update(content_sha256.encode())
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            created, value = entry
+            if not self._expired(created):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._memory[key]
+
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                created, value = entry
+                self._remember(key, created, value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+
+        created = time.time()
+        self._remember(key, created, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_set, key, created, value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _remember(self, key: str, created: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._disk_remove(path)
+            return None
+
+        if self._expired(entry["created"]):
+            self._disk_remove(path)
+            return None
+
+        # mtime marks recent use, the oldest files are evicted first
+        os.utime(path)
+        return entry["created"], entry["value"]
+
+    def _disk_set(self, key: str, created: float, value: Dict[str, Any]) -> None:
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "value": value}, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = self._disk_usage()
+        else:
+            self._disk_bytes += size
+        if self._disk_bytes > self.disk_max_bytes:
+            self._evict_disk()
+
+    def _disk_remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        if self._disk_bytes is not None:
+            self._disk_bytes -= size
+
+    def _disk_entries(self) -> list:
+        try:
+            return [
+                entry
+                for entry in os.scandir(self.disk_dir)
+                if entry.is_file() and entry.name.endswith(".json")
+            ]
+        except FileNotFoundError:
+            return []
+
+    def _disk_usage(self) -> int:
+        return sum(entry.stat().st_size for entry in self._disk_entries())
+
+    def _evict_disk(self) -> None:
+        # least recently used first, expired entries are dropped lazily on read
+        entries = sorted(self._disk_entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        # free a little more than needed so that eviction does not run on every write
+        target = self.disk_max_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+        logger.debug(f"Result cache evicted down to {total} bytes")
+
+
+result_cache = ResultCache(
+    enabled=config.RESULT_CACHE_ENABLED,
+    max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+    disk_dir=config.RESULT_CACHE_DIR or None,
+    disk_max_bytes=config.RESULT_CACHE_DISK_MAX_BYTES,
+    ttl=config.RESULT_CACHE_TTL,
+)
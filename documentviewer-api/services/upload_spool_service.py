@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+from fastapi import UploadFile
+from loguru import logger
+
+from core.config import config
+from services.admission_service.service import DocumentTooLargeError
+
+# an upload is processed from its spooled file, benchmarks and tools may pass bytes
+DocumentSource = Union[bytes, str]
+
+
+def open_source(source: DocumentSource) -> Union[BinaryIO, str]:
+    """Argument for pdfplumber.open / Image.open, paths are read from disk directly"""
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+class SpooledUpload:
+    """An upload written to a temporary file, removed with discard()"""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove spooled upload {self.path}: {e}")
+
+
+class UploadSpool:
+    """
+    Streams uploads to disk.
+
+    The body is copied in `chunk_size` pieces and hashed on the way, so an
+    upload is never held in memory as a whole. Pool workers receive the path
+    and poppler, pdfplumber and PIL read the file themselves.
+    """
+
+    def __init__(self, directory: Optional[str], chunk_size: int, max_bytes: int):
+        self.directory = directory or None
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    async def spool(self, file: UploadFile) -> SpooledUpload:
+        # the copy does blocking file I/O, keep it off the event loop
+        return await asyncio.to_thread(self._copy, file.file)
+
+    def _copy(self, source: BinaryIO) -> SpooledUpload:
+        source.seek(0)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix="upload-", delete=False) as tmp:
+            upload = SpooledUpload(tmp.name, 0, "")
+            try:
+                while chunk := source.read(self.chunk_size):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise DocumentTooLargeError(
+                            f"File is larger than the limit of {self.max_bytes} bytes"
+                        )
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except BaseException:
+                tmp.close()
+                upload.discard()
+                raise
+        upload.size = size
+        upload.sha256 = digest.hexdigest()
+        return upload
+
+
+upload_spool = UploadSpool(
+    directory=config.UPLOAD_SPOOL_DIR,
+    chunk_size=config.UPLOAD_CHUNK_SIZE,
+    max_bytes=config.MAX_UPLOAD_BYTES,
+)
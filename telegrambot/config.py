@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import Field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -14,6 +14,56 @@ class Config(BaseSettings):
     MODE: Literal["PROD", "DEV"] = "DEV"
     BOT_TOKEN: SecretStr = Field(..., env="BOT_TOKEN")
     SERVER_URL: str
+    # Bot API server, e.g. a local one; empty value means api.telegram.org
+    TELEGRAM_API_URL: Optional[str] = None
+
+    # "polling" runs a single long-poll consumer, "webhook" serves updates over HTTP
+    # and can run as several replicas behind a load balancer
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    # public base URL the webhook is registered at; empty value skips setWebhook
+    WEBHOOK_URL: Optional[str] = None
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: Optional[SecretStr] = None
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    # tasks dispatching updates to background handlers and updates allowed to wait for them
+    WEBHOOK_WORKERS: int = Field(default=16, ge=1)
+    WEBHOOK_QUEUE_SIZE: int = Field(default=1000, ge=1)
+    # recently seen update_ids, redelivered updates are dropped
+    WEBHOOK_DEDUP_SIZE: int = Field(default=10_000, ge=1)
+
+    # uploads sent to the server at once, overall and per user; the rest wait in a queue
+    UPLOAD_MAX_IN_FLIGHT: int = Field(default=4, ge=1)
+    UPLOAD_MAX_PER_USER: int = Field(default=1, ge=1)
+    UPLOAD_QUEUE_SIZE: int = Field(default=100, ge=0)
+
+    # files of an album are collected until none arrived for this many seconds
+    MEDIA_GROUP_WINDOW: float = 1.0
+    # pages of one album uploaded at the same time; an album waits in the upload queue
+    # as one file, but each of these uploads counts against UPLOAD_MAX_IN_FLIGHT,
+    # at most half of it is given to one album
+    ALBUM_PARALLEL_UPLOADS: int = Field(default=2, ge=1)
+
+    # Responses for files already processed, keyed by Telegram file_unique_id
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_PATH: str = "cache/results.sqlite3"
+    RESULT_CACHE_MAX_ENTRIES: int = Field(default=10_000, ge=1)
+    # seconds, 0 means entries never expire
+    RESULT_CACHE_TTL: int = 7 * 24 * 60 * 60
+
+    # one pooled HTTP session is shared by every upload to the server
+    HTTP_POOL_LIMIT: int = Field(default=100, ge=0)
+    HTTP_POOL_LIMIT_PER_HOST: int = Field(default=20, ge=0)
+    # seconds an idle connection is kept open for the next upload
+    HTTP_KEEPALIVE_TIMEOUT: float = 30
+    HTTP_DNS_CACHE_TTL: int = 300
+    HTTP_TIMEOUT: int = 300
+    # Telegram downloads are forwarded to the server in chunks of this size
+    DOWNLOAD_CHUNK_SIZE: int = Field(default=64 * 1024, ge=1)
+
+    LOG_LEVEL: Literal["TRACE", "DEBUG", "INFO", "WARNING", "ERROR"] = "DEBUG"
+    # share of DEBUG lines that are written; defaults to all of them in DEV and 10% in PROD
+    LOG_DEBUG_SAMPLE_RATE: Optional[float] = Field(default=None, ge=0, le=1)
 
 
 config = Config()
@@ -1,15 +1,24 @@
 import asyncio
 
 from aiogram import Bot, Dispatcher, F, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command
 from aiogram.types import Message
 from loguru import logger
 
 from config import config
 from logger import *  # noqa
+from services.result_cache_service import result_cache
 from services.upload_file_service import upload_file_service
+from services.webhook_service import run_webhook
 
-bot = Bot(token=config.BOT_TOKEN.get_secret_value())
+session = (
+    AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    if config.TELEGRAM_API_URL
+    else None
+)
+bot = Bot(token=config.BOT_TOKEN.get_secret_value(), session=session)
 dp = Dispatcher()
 
 
@@ -26,6 +35,11 @@ async def cmd_start(message: Message):
     await message.answer(welcome_text)
 
 
+@dp.message(F.media_group_id, F.photo | F.document)
+async def album_handler(message: Message):
+    await upload_file_service.handle_album_message(message)
+
+
 @dp.message(F.document)
 async def handle_document(message: Message):
     await upload_file_service.handle_document(message)
@@ -41,10 +55,25 @@ async def text_handler(message: types.Message):
     await message.answer("Отправьте файл")
 
 
+@dp.startup()
+async def on_startup():
+    await upload_file_service.start()
+
+
+@dp.shutdown()
+async def on_shutdown():
+    await upload_file_service.close()
+    result_cache.close()
+
+
 async def main():
     logger.info("Bot is starting...")
     await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if config.BOT_MODE == "webhook":
+        logger.info("Bot is starting in webhook mode...")
+        run_webhook(bot, dp)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+
+from aiogram.types import Message
+
+from config import config
+
+
+class _Album:
+    def __init__(self):
+        self.messages: list[Message] = []
+        self.updated = asyncio.Event()
+
+
+class MediaGroupCollector:
+    """
+    Collects the messages of an album.
+
+    Telegram delivers every photo or file of a media group as a separate
+    message. The first message of a group waits until no new message has
+    arrived for `window` seconds and gets the whole album in message order,
+    the other messages get None. Messages of one album must reach the same
+    process; with several webhook replicas the load balancer has to keep a
+    chat on one replica.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._albums: dict[str, _Album] = {}
+
+    async def collect(self, message: Message) -> list[Message] | None:
+        group_id = message.media_group_id
+        album = self._albums.get(group_id)
+        if album is not None:
+            album.messages.append(message)
+            album.updated.set()
+            return None
+
+        album = self._albums[group_id] = _Album()
+        album.messages.append(message)
+        try:
+            while True:
+                album.updated.clear()
+                try:
+                    await asyncio.wait_for(album.updated.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            del self._albums[group_id]
+        return sorted(album.messages, key=lambda album_message: album_message.message_id)
+
+
+media_group_collector = MediaGroupCollector(window=config.MEDIA_GROUP_WINDOW)
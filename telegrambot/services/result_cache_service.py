@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from config import config
+
+
+class ResultCache:
+    """
+    Server responses keyed by Telegram file_unique_id.
+
+    The same file forwarded again has the same file_unique_id, so its result
+    is answered without downloading it or calling the server. Entries live in
+    a SQLite file, the least recently used ones are evicted above
+    `max_entries` and entries older than `ttl` seconds are ignored.
+    """
+
+    def __init__(self, enabled: bool, path: str, max_entries: int, ttl: int):
+        self.enabled = enabled
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, file_unique_id: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            value = await asyncio.to_thread(self._get, file_unique_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache read failed: {e}")
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, file_unique_id: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._set, file_unique_id, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache write failed: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._connection = connection
+        return self._connection
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                with connection:
+                    connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            with connection:
+                connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def _set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created, accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, data, now, now),
+                )
+                connection.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    "SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+
+result_cache = ResultCache(
+    enabled=config.RESULT_CACHE_ENABLED,
+    path=config.RESULT_CACHE_PATH,
+    max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+    ttl=config.RESULT_CACHE_TTL,
+)
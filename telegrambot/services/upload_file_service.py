@@ -1,11 +1,18 @@
 import asyncio
 import os
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, TypeVar
 
 import aiohttp
+from aiogram import Bot
 from aiogram.types import Message
 from loguru import logger
 
 from config import config
+from services.media_group_service import media_group_collector
+from services.result_cache_service import result_cache
+from services.upload_scheduler import SchedulerBusyError, upload_scheduler
+
+T = TypeVar("T")
 
 
 class UploadFileService:
@@ -23,6 +30,37 @@ class UploadFileService:
 
     def __init__(self, server_url: str):
         self.server_url = server_url
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        """Open the pooled session; connections to the server are reused between uploads"""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_POOL_LIMIT,
+            limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT),
+        )
+        logger.info(
+            f"HTTP session started: {config.HTTP_POOL_LIMIT} connections, "
+            f"{config.HTTP_POOL_LIMIT_PER_HOST} per host"
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            logger.info("HTTP session closed")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
 
     async def handle_photo(self, message: Message):
         user_id = message.from_user.id
@@ -41,6 +79,7 @@ class UploadFileService:
             return await self._process_and_respond(
                 message=message,
                 file_id=photo.file_id,
+                file_unique_id=photo.file_unique_id,
                 user_id=user_id,
                 filename=filename,
                 progress_text="📥 Получил изображение. Загружаю на сервер...",
@@ -81,6 +120,7 @@ class UploadFileService:
             return await self._process_and_respond(
                 message=message,
                 file_id=document.file_id,
+                file_unique_id=document.file_unique_id,
                 user_id=user_id,
                 filename=file_name,
                 progress_text=f"📥 Получил файл {file_name}. Загружаю на сервер...",
@@ -93,57 +133,129 @@ class UploadFileService:
             await message.answer("❌ Произошла критическая ошибка при обработке файла")
             return {"error": error_msg}
 
-    async def send_file_to_server(self, file_bytes: bytes, user_id: int, filename: str) -> dict:
+    async def handle_album_message(self, message: Message) -> list[dict] | None:
+        """Photos and files of one media group are answered together by the first message"""
+        messages = await media_group_collector.collect(message)
+        if messages is None:
+            return None
+        return await self.handle_album(messages)
+
+    async def handle_album(self, messages: list[Message]) -> list[dict]:
+        first = messages[0]
+        user_id = first.from_user.id
+        logger.info(f"Start processing album of {len(messages)} files from the user {user_id}")
+
         try:
-            endpoint, content_type = self._choose_endpoint_and_content_type(filename)
-            url = f"{self.server_url}{endpoint}"
+            files = [self._album_file(album_message) for album_message in messages]
+            files = [file for file in files if file]
+            if len(files) < len(messages):
+                skipped = len(messages) - len(files)
+                logger.warning(f"{skipped} files of an album skipped for user {user_id}")
+            if not files:
+                await first.answer(
+                    "❌ Неверный формат файлов!\n"
+                    f"📄 Пожалуйста, отправьте файлы в формате {self.allowed_extensions}."
+                )
+                return [{"error": "No supported files in the album"}]
 
-            async with aiohttp.ClientSession() as session:
-                form_data = aiohttp.FormData()
-                form_data.add_field(
-                    "file",
-                    file_bytes,
-                    filename=filename,
-                    content_type=content_type,
+            # pages seen before are answered from the cache, the others are uploaded
+            responses = list(
+                await asyncio.gather(
+                    *(result_cache.get(file_unique_id) for _, file_unique_id, _ in files)
                 )
-                form_data.add_field("user_id", str(user_id))
-                form_data.add_field("filename", filename)
+            )
+            pending = [i for i, response in enumerate(responses) if response is None]
 
+            if pending:
+                progress_text = f"📥 Получил {len(files)} страниц. Загружаю на сервер..."
+                processing_msg = await first.answer(progress_text)
                 try:
-                    async with session.post(
-                        url,
-                        data=form_data,
-                        timeout=aiohttp.ClientTimeout(total=300),
-                    ) as response:
-                        response_text = await response.text()
-                        logger.debug(f"Server response: status {response.status}")
-
-                        if response.status == 200:
-                            try:
-                                result = await response.json()
-                                logger.debug(f"File {filename} was successfully sent to the server")
-                                return result
-                            except Exception as e:
-                                error_msg = f"Error parsing JSON response: {str(e)}"
-                                logger.error(f"{error_msg}")
-                                return {"error": error_msg, "response_text": response_text}
-                        else:
-                            error_msg = f"Server error: {response.status}"
-                            logger.error(f"{error_msg} for file {filename}: {response_text}")
-                            return {
-                                "error": error_msg,
-                                "message": response_text,
-                                "status_code": response.status,
-                            }
-
-                except asyncio.TimeoutError:
-                    error_msg = "Timeout when sending a file to the server"
-                    logger.error(f"{error_msg} for file {filename}")
-                    return {"error": error_msg}
-                except aiohttp.ClientError as e:
-                    error_msg = f"Connection error: {str(e)}"
-                    logger.error(f"{error_msg} for file {filename}")
-                    return {"error": error_msg}
+                    # the album queues as one upload but its pages count against
+                    # the global in-flight cap
+                    uploaded = await self._in_upload_slot(
+                        user_id,
+                        processing_msg,
+                        progress_text,
+                        lambda parallelism: self._upload_album_files(
+                            first, [files[i] for i in pending], user_id, parallelism
+                        ),
+                        size=min(len(pending), config.ALBUM_PARALLEL_UPLOADS),
+                    )
+                except SchedulerBusyError:
+                    logger.warning(f"Upload queue is full, rejecting album from user {user_id}")
+                    await processing_msg.edit_text("⏳ Сервер перегружен, попробуйте позже")
+                    return [{"error": "Upload queue is full"}]
+                for i, response in zip(pending, uploaded, strict=True):
+                    responses[i] = response
+            else:
+                logger.info(f"Result cache hit for the whole album from the user {user_id}")
+
+            response_text = "\n".join(
+                f"📄 Страница {page_num}:\n{self.format_server_response(response)}"
+                for page_num, response in enumerate(responses, 1)
+            )
+            await self._send_text(first, f"✅ Обработано страниц: {len(responses)}", response_text)
+            return responses
+
+        except Exception as e:
+            error_msg = f"Critical error when processing an album: {str(e)}"
+            logger.error(f"{error_msg} for user {user_id}")
+            await first.answer("❌ Произошла критическая ошибка при обработке файлов")
+            return [{"error": error_msg}]
+
+    async def send_file_to_server(
+        self, file_data: bytes | AsyncIterable[bytes], user_id: int, filename: str
+    ) -> dict:
+        """Upload a file; an async iterable of chunks is sent as it is produced"""
+        try:
+            endpoint, content_type = self._choose_endpoint_and_content_type(filename)
+            url = f"{self.server_url}{endpoint}"
+
+            session = await self._get_session()
+            form_data = aiohttp.FormData()
+            form_data.add_field(
+                "file",
+                file_data,
+                filename=filename,
+                content_type=content_type,
+            )
+            form_data.add_field("user_id", str(user_id))
+            form_data.add_field("filename", filename)
+
+            try:
+                async with session.post(
+                    url,
+                    data=form_data,
+                ) as response:
+                    response_text = await response.text()
+                    logger.debug(f"Server response: status {response.status}")
+
+                    if response.status == 200:
+                        try:
+                            result = await response.json()
+                            logger.debug(f"File {filename} was successfully sent to the server")
+                            return result
+                        except Exception as e:
+                            error_msg = f"Error parsing JSON response: {str(e)}"
+                            logger.error(f"{error_msg}")
+                            return {"error": error_msg, "response_text": response_text}
+                    else:
+                        error_msg = f"Server error: {response.status}"
+                        logger.error(f"{error_msg} for file {filename}: {response_text}")
+                        return {
+                            "error": error_msg,
+                            "message": response_text,
+                            "status_code": response.status,
+                        }
+
+            except asyncio.TimeoutError:
+                error_msg = "Timeout when sending a file to the server"
+                logger.error(f"{error_msg} for file {filename}")
+                return {"error": error_msg}
+            except aiohttp.ClientError as e:
+                error_msg = f"Connection error: {str(e)}"
+                logger.error(f"{error_msg} for file {filename}")
+                return {"error": error_msg}
 
         except Exception as e:
             error_msg = f"Unexpected error when sending a file: {str(e)}"
@@ -190,6 +302,7 @@ class UploadFileService:
         self,
         message: Message,
         file_id: str,
+        file_unique_id: str,
         user_id: int,
         filename: str,
         progress_text: str,
@@ -198,22 +311,30 @@ class UploadFileService:
         logger.info(f"Start processing {filename} from the user {user_id}")
 
         try:
+            # a forwarded file keeps its file_unique_id, answer it without the server
+            cached_response = await result_cache.get(file_unique_id)
+            if cached_response is not None:
+                logger.info(f"Result cache hit for {filename} from the user {user_id}")
+                await self._send_result(message, success_prefix, cached_response)
+                return cached_response
+
             processing_msg = await message.answer(progress_text)
 
-            file_bytes = await self._download_tg_file(message, file_id)
-            server_response = await self.send_file_to_server(
-                file_bytes=file_bytes,
-                user_id=user_id,
-                filename=filename,
-            )
-            m_size = 4096
-            response_text = self.format_server_response(server_response)
-            print(response_text)
-            text = [response_text[i : i + m_size] for i in range(0, len(response_text), m_size)]
-            print(text)
-            await processing_msg.answer(f"{success_prefix}")
-            for i in range(len(text)):
-                await processing_msg.answer(f"{text[i]}")
+            try:
+                server_response = await self._in_upload_slot(
+                    user_id,
+                    processing_msg,
+                    progress_text,
+                    lambda _: self._upload_tg_file(message, file_id, user_id, filename),
+                )
+            except SchedulerBusyError:
+                logger.warning(f"Upload queue is full, rejecting {filename} from user {user_id}")
+                await processing_msg.edit_text("⏳ Сервер перегружен, попробуйте позже")
+                return {"error": "Upload queue is full"}
+
+            if self._is_cacheable(server_response):
+                await result_cache.set(file_unique_id, server_response)
+            await self._send_result(processing_msg, success_prefix, server_response)
             return server_response
 
         except Exception as e:
@@ -227,27 +348,126 @@ class UploadFileService:
 
             return {"error": error_msg}
 
-    async def _download_tg_file(self, message: Message, file_id: str) -> bytes:
+    async def _in_upload_slot(
+        self,
+        user_id: int,
+        processing_msg: Message,
+        progress_text: str,
+        upload: Callable[[int], Awaitable[T]],
+        size: int = 1,
+    ) -> T:
+        """
+        Run `upload` once the scheduler gives slots for up to `size` concurrent
+        uploads, showing the queue position meanwhile; `upload` gets the number
+        of uploads it may run at once
+        """
+        queued = False
+
+        async def show_position(position: int) -> None:
+            nonlocal queued
+            queued = True
+            await processing_msg.edit_text(f"{progress_text}\n⏳ Вы в очереди: {position}")
+
+        async with upload_scheduler.slot(
+            user_id, on_position=show_position, size=size
+        ) as parallelism:
+            if queued:
+                await processing_msg.edit_text(progress_text)
+            return await upload(parallelism)
+
+    async def _send_result(self, message: Message, success_prefix: str, server_response: dict):
+        await self._send_text(message, success_prefix, self.format_server_response(server_response))
+
+    async def _send_text(self, message: Message, success_prefix: str, response_text: str):
+        m_size = 4096
+        text = [response_text[i : i + m_size] for i in range(0, len(response_text), m_size)]
+        logger.debug(f"Sending a response of {len(response_text)} chars in {len(text)} messages")
+        await message.answer(f"{success_prefix}")
+        for i in range(len(text)):
+            await message.answer(f"{text[i]}")
+
+    @staticmethod
+    def _is_cacheable(server_response: dict) -> bool:
+        return "error" not in server_response and server_response.get("status") == "success"
+
+    async def _upload_album_files(
+        self,
+        message: Message,
+        files: list[tuple[str, str, str]],
+        user_id: int,
+        parallelism: int,
+    ) -> list[dict]:
+        """Upload `parallelism` pages of an album at a time, the responses keep the page order"""
+        semaphore = asyncio.Semaphore(parallelism)
+
+        async def upload(file_id: str, file_unique_id: str, filename: str) -> dict:
+            async with semaphore:
+                try:
+                    response = await self._upload_tg_file(message, file_id, user_id, filename)
+                except Exception as e:
+                    logger.error(f"Error during processing {filename}: {str(e)}")
+                    return {"error": str(e)}
+            if self._is_cacheable(response):
+                await result_cache.set(file_unique_id, response)
+            return response
+
+        return await asyncio.gather(*(upload(*file) for file in files))
+
+    def _album_file(self, message: Message) -> tuple[str, str, str] | None:
+        """file_id, file_unique_id and file name of an album item, None if it is not supported"""
+        if message.photo:
+            photo = message.photo[-1]
+            filename = f"photo_{message.from_user.id}_{photo.file_id}.jpg"
+            return photo.file_id, photo.file_unique_id, filename
+        document = message.document
+        if document and document.file_name and self._is_allowed_filename(document.file_name):
+            return document.file_id, document.file_unique_id, document.file_name
+        return None
+
+    async def _upload_tg_file(
+        self, message: Message, file_id: str, user_id: int, filename: str
+    ) -> dict:
+        file_stream = await self._stream_tg_file(message, file_id)
+        if file_stream is None:
+            raise RuntimeError(f"Failed to download file {file_id} from Telegram")
+        return await self.send_file_to_server(
+            file_data=file_stream,
+            user_id=user_id,
+            filename=filename,
+        )
+
+    async def _stream_tg_file(self, message: Message, file_id: str) -> AsyncIterator[bytes] | None:
+        """Chunks of a Telegram file, read while they are forwarded to the server"""
         try:
             file_info = await message.bot.get_file(file_id)
             if not file_info:
                 logger.error(f"Failed to get file information {file_id}")
                 return None
-
-            file_path = file_info.file_path
-
-            file_bytes = await message.bot.download_file(file_path)
-            if file_bytes:
-                logger.debug(f"File {file_id} uploaded successfully")
-            else:
-                logger.error(f"Failed to load file {file_id}")
-
-            return file_bytes
+            return self._iter_tg_file(message.bot, file_info.file_path, file_id)
 
         except Exception as e:
             logger.error(f"Error loading file {file_id} from Telegram: {str(e)}")
             return None
 
+    async def _iter_tg_file(self, bot: Bot, file_path: str, file_id: str) -> AsyncIterator[bytes]:
+        if bot.session.api.is_local:
+            # a local Bot API server keeps the file on our disk, there is no download to overlap
+            file_bytes = await bot.download_file(file_path)
+            yield file_bytes.getvalue()
+            return
+
+        size = 0
+        url = bot.session.api.file_url(bot.token, file_path)
+        async for chunk in bot.session.stream_content(
+            url=url,
+            timeout=config.HTTP_TIMEOUT,
+            chunk_size=config.DOWNLOAD_CHUNK_SIZE,
+            raise_for_status=True,
+        ):
+            size += len(chunk)
+            yield chunk
+        logger.debug(f"File {file_id} streamed to the server: {size} bytes")
+
     def _is_allowed_filename(self, filename: str) -> bool:
         try:
             file_ext = os.path.splitext(filename.lower())[1]
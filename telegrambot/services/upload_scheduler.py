@@ -0,0 +1,152 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+
+from loguru import logger
+
+from config import config
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the upload queue is full"""
+
+
+class _Waiter:
+    def __init__(self, user_id: int, size: int, on_position: PositionCallback | None):
+        self.user_id = user_id
+        self.size = size
+        self.on_position = on_position
+        self.position = 0
+        self.granted = asyncio.get_running_loop().create_future()
+
+
+class UploadScheduler:
+    """
+    Limits the uploads the bot sends to the server at the same time.
+
+    At most `max_in_flight` uploads run at once and at most `max_per_user` of
+    them belong to one user. The others wait in a FIFO queue; a waiter is
+    skipped only while its user is at the per-user cap, so one user sending a
+    batch of files does not hold back everyone behind them. Waiters are told
+    their position whenever it changes.
+
+    A submission can hold `size` uploads, e.g. the pages of an album: they
+    count against `max_in_flight` one by one, but as a single submission
+    against the per-user cap and in the queue. `size` is capped at half of
+    `max_in_flight`, so a large submission never has to wait for the whole
+    capacity to drain while single uploads queue up behind it. A full queue
+    only rejects submissions that cannot start right away.
+    """
+
+    def __init__(self, max_in_flight: int, max_per_user: int, queue_size: int):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.queue_size = queue_size
+        self._in_flight = 0
+        self._per_user: dict[int, int] = {}
+        self._waiters: list[_Waiter] = []
+        self._notifications: set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def slot(
+        self, user_id: int, on_position: PositionCallback | None = None, size: int = 1
+    ) -> AsyncIterator[int]:
+        """
+        Hold slots for up to `size` concurrent uploads, waiting in the queue
+        until they are free; yields the number of uploads that may run
+        """
+        size = max(1, min(size, self.max_in_flight // 2))
+        await self._acquire(user_id, size, on_position)
+        try:
+            yield size
+        finally:
+            self._release(user_id, size)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "users": len(self._per_user),
+        }
+
+    async def _acquire(self, user_id: int, size: int, on_position: PositionCallback | None) -> None:
+        waiter = _Waiter(user_id, size, on_position)
+        self._waiters.append(waiter)
+        self._dispatch()
+        if waiter.granted.done():
+            return
+
+        if len(self._waiters) > self.queue_size:
+            self._waiters.remove(waiter)
+            # a cancelled waiter is never told its position
+            waiter.granted.cancel()
+            logger.warning(f"Upload queue is full: {self.queue_size} uploads waiting")
+            raise SchedulerBusyError(self.queue_size)
+
+        logger.debug(f"Upload of user {user_id} queued at position {waiter.position}")
+        try:
+            await waiter.granted
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._dispatch()
+            elif waiter.granted.done() and not waiter.granted.cancelled():
+                # the slot was granted right before the cancellation
+                self._release(user_id, size)
+            raise
+
+    def _release(self, user_id: int, size: int) -> None:
+        self._in_flight -= size
+        self._per_user[user_id] -= 1
+        if not self._per_user[user_id]:
+            del self._per_user[user_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start every waiter that fits, in queue order, then report the new positions"""
+        for waiter in list(self._waiters):
+            if waiter.granted.cancelled():
+                # its task is cancelled but has not run the cleanup yet
+                self._waiters.remove(waiter)
+                continue
+            if self._in_flight + waiter.size > self.max_in_flight:
+                # strict FIFO, smaller submissions do not overtake a large one
+                break
+            if self._per_user.get(waiter.user_id, 0) >= self.max_per_user:
+                continue
+            self._waiters.remove(waiter)
+            self._in_flight += waiter.size
+            self._per_user[waiter.user_id] = self._per_user.get(waiter.user_id, 0) + 1
+            waiter.granted.set_result(None)
+
+        for position, waiter in enumerate(self._waiters, 1):
+            if waiter.position != position:
+                waiter.position = position
+                self._notify(waiter)
+
+    def _notify(self, waiter: _Waiter) -> None:
+        if waiter.on_position is None:
+            return
+        # feedback goes to Telegram, the queue must not wait for it
+        task = asyncio.create_task(self._report(waiter))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    @staticmethod
+    async def _report(waiter: _Waiter) -> None:
+        # the position may have changed again or the upload started in the meantime
+        if waiter.granted.done():
+            return
+        try:
+            await waiter.on_position(waiter.position)
+        except Exception as e:
+            logger.debug(f"Failed to report queue position {waiter.position}: {e}")
+
+
+upload_scheduler = UploadScheduler(
+    max_in_flight=config.UPLOAD_MAX_IN_FLIGHT,
+    max_per_user=config.UPLOAD_MAX_PER_USER,
+    queue_size=config.UPLOAD_QUEUE_SIZE,
+)
@@ -0,0 +1,174 @@
+import asyncio
+import hmac
+from collections import OrderedDict
+from contextlib import suppress
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from loguru import logger
+
+from config import config
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Receives updates over a webhook and feeds them to the dispatcher.
+
+    Every request is answered as soon as the update is queued. `workers` tasks
+    take updates off the queue and start each handler as a background task,
+    so a handler waiting for its upload slot does not hold up the updates of
+    other users; uploads are bounded by the upload scheduler. Telegram
+    redelivers updates it did not get a timely 200 for, so recently seen
+    update_ids are dropped. Several replicas can serve the same webhook URL
+    behind a load balancer; the deduplication window is per replica.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        workers: int,
+        queue_size: int,
+        dedup_size: int,
+    ):
+        self.bot = bot
+        self.dp = dp
+        self.workers = workers
+        self.queue_size = queue_size
+        self.dedup_size = dedup_size
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._handlers: set[asyncio.Task] = set()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(config.WEBHOOK_PATH, self.handle)
+        app.router.add_get("/health", self.health)
+        app.on_startup.append(self._on_startup)
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError as e:
+            # malformed JSON or not an update, a retry would fail the same way
+            logger.warning(f"Invalid webhook request: {e}")
+            return web.Response(status=400)
+        if self._is_duplicate(update.update_id):
+            logger.debug(f"Duplicate update {update.update_id} dropped")
+            return web.Response()
+
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram retries the update later, possibly on another replica
+            self._seen.pop(update.update_id, None)
+            logger.warning(f"Update queue is full, rejecting update {update.update_id}")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "OK",
+                "mode": config.BOT_MODE,
+                "workers": self.workers,
+                "queued": self._queue.qsize() if self._queue else 0,
+                "handlers": len(self._handlers),
+            }
+        )
+
+    def _authorized(self, request: web.Request) -> bool:
+        if config.WEBHOOK_SECRET is None:
+            return True
+        token = request.headers.get(SECRET_HEADER, "")
+        return hmac.compare_digest(token, config.WEBHOOK_SECRET.get_secret_value())
+
+    def _is_duplicate(self, update_id: int) -> bool:
+        if update_id in self._seen:
+            return True
+        self._seen[update_id] = None
+        while len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return False
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self._queue.get()
+            try:
+                task = asyncio.create_task(self._handle_update(update))
+                self._handlers.add(task)
+                task.add_done_callback(self._handlers.discard)
+            finally:
+                self._queue.task_done()
+
+    async def _handle_update(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.exception(f"Failed to handle update {update.update_id}: {e}")
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"update-worker-{i}")
+            for i in range(self.workers)
+        ]
+        await self.dp.emit_startup(bot=self.bot)
+
+        if config.WEBHOOK_URL:
+            # every replica registers the same URL, the call is idempotent
+            await self.bot.set_webhook(
+                url=f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+                secret_token=(
+                    config.WEBHOOK_SECRET.get_secret_value() if config.WEBHOOK_SECRET else None
+                ),
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+        logger.info(
+            f"Webhook server started on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}"
+            f"{config.WEBHOOK_PATH} with {self.workers} workers"
+        )
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        # the webhook stays registered, other replicas keep serving it;
+        # let queued updates be dispatched and running handlers finish,
+        # an upload takes at most HTTP_TIMEOUT
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._queue.join(), timeout=config.HTTP_TIMEOUT)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._handlers:
+            _, pending = await asyncio.wait(self._handlers, timeout=config.HTTP_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self.dp.emit_shutdown(bot=self.bot)
+        await self.bot.session.close()
+        logger.info("Webhook server stopped")
+
+
+def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    server = WebhookServer(
+        bot,
+        dp,
+        workers=config.WEBHOOK_WORKERS,
+        queue_size=config.WEBHOOK_QUEUE_SIZE,
+        dedup_size=config.WEBHOOK_DEDUP_SIZE,
+    )
+    web.run_app(
+        server.create_app(),
+        host=config.WEBHOOK_HOST,
+        port=config.WEBHOOK_PORT,
+        print=None,
+    )